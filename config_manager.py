@@ -1,92 +1,138 @@
-import yaml
-import os
-from typing import Dict, Any
-
-class ConfigManager:
-    def __init__(self, config_path: str = "config.yaml"):
-        self.config_path = config_path
-        self.config = self.load_config()
-        
-    def load_config(self) -> Dict[str, Any]:
-        """Load configuration from YAML file"""
-        if not os.path.exists(self.config_path):
-            raise FileNotFoundError(f"Configuration file not found: {self.config_path}")
-            
-        try:
-            with open(self.config_path, 'r', encoding='utf-8') as file:
-                config = yaml.safe_load(file)
-                return config
-        except yaml.YAMLError as e:
-            raise Exception(f"Error parsing YAML config file: {e}")
-        except Exception as e:
-            raise Exception(f"Error loading config file: {e}")
-    
-    def reload_config(self) -> Dict[str, Any]:
-        """Reload configuration from file"""
-        self.config = self.load_config()
-        return self.config
-    
-    def get(self, key_path: str, default=None):
-        """Get configuration value using dot notation (e.g., 'face_detection.confidence_threshold')"""
-        keys = key_path.split('.')
-        value = self.config
-        
-        try:
-            for key in keys:
-                value = value[key]
-            return value
-        except (KeyError, TypeError):
-            return default
-    
-    def get_face_detection_config(self) -> Dict[str, Any]:
-        """Get face detection configuration"""
-        return self.config.get('face_detection', {})
-    
-    def get_face_recognition_config(self) -> Dict[str, Any]:
-        """Get face recognition configuration"""
-        return self.config.get('face_recognition', {})
-    
-    def get_camera_config(self) -> Dict[str, Any]:
-        """Get camera configuration"""
-        return self.config.get('camera', {})
-    
-    def get_display_config(self) -> Dict[str, Any]:
-        """Get display configuration"""
-        return self.config.get('display', {})
-    
-    def get_colors_config(self) -> Dict[str, Any]:
-        """Get colors configuration"""
-        return self.config.get('colors', {})
-    
-    def update_config(self, key_path: str, value: Any):
-        """Update configuration value and save to file"""
-        keys = key_path.split('.')
-        config = self.config
-        
-        # Navigate to the parent of the target key
-        for key in keys[:-1]:
-            if key not in config:
-                config[key] = {}
-            config = config[key]
-        
-        # Set the final value
-        config[keys[-1]] = value
-        
-        # Save to file
-        self.save_config()
-    
-    def save_config(self):
-        """Save current configuration to file"""
-        try:
-            with open(self.config_path, 'w', encoding='utf-8') as file:
-                yaml.safe_dump(self.config, file, default_flow_style=False, sort_keys=False)
-        except Exception as e:
-            raise Exception(f"Error saving config file: {e}")
-    
-    def __getitem__(self, key):
-        """Allow dictionary-style access"""
-        return self.config[key]
-    
-    def __contains__(self, key):
-        """Allow 'in' operator"""
-        return key in self.config
+import yaml
+import os
+import copy
+import threading
+from collections import OrderedDict
+from typing import Dict, Any
+
+# LibYAML-backed loader/dumper when PyYAML was built against libyaml
+try:
+    from yaml import CSafeLoader as _Loader, CSafeDumper as _Dumper
+except ImportError:
+    from yaml import SafeLoader as _Loader, SafeDumper as _Dumper
+
+# Parsed configs keyed by absolute path -> (mtime_ns, size, config)
+_YAML_CACHE = OrderedDict()
+_YAML_CACHE_SIZE = 100
+_YAML_CACHE_LOCK = threading.Lock()
+
+def _cache_put(key: str, st: os.stat_result, config: Dict[str, Any]):
+    """Insert a parsed config into the LRU cache"""
+    with _YAML_CACHE_LOCK:
+        _YAML_CACHE[key] = (st.st_mtime_ns, st.st_size, config)
+        _YAML_CACHE.move_to_end(key)
+        if len(_YAML_CACHE) > _YAML_CACHE_SIZE:
+            _YAML_CACHE.popitem(last=False)
+
+def _cache_get(key: str, st: os.stat_result):
+    """Return the cached config if the file is unchanged, else None"""
+    with _YAML_CACHE_LOCK:
+        entry = _YAML_CACHE.get(key)
+        if entry is None or entry[0] != st.st_mtime_ns or entry[1] != st.st_size:
+            return None
+        _YAML_CACHE.move_to_end(key)
+        return entry[2]
+
+def _flatten(config: Dict[str, Any], prefix: str = "", flat: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Map every dotted key path (sections included) to its value"""
+    if flat is None:
+        flat = {}
+    for key, value in config.items():
+        path = f"{prefix}{key}"
+        flat[path] = value
+        if isinstance(value, dict):
+            _flatten(value, f"{path}.", flat)
+    return flat
+
+class ConfigManager:
+    def __init__(self, config_path: str = "config.yaml"):
+        self.config_path = config_path
+        self.config = self.load_config()
+        self._flat = _flatten(self.config or {})
+        
+    def load_config(self) -> Dict[str, Any]:
+        """Load configuration from YAML file"""
+        if not os.path.exists(self.config_path):
+            raise FileNotFoundError(f"Configuration file not found: {self.config_path}")
+            
+        try:
+            st = os.stat(self.config_path)
+            key = os.path.abspath(self.config_path)
+            cached = _cache_get(key, st)
+            if cached is not None:
+                # Deep copy so update_config cannot mutate the cached tree
+                return copy.deepcopy(cached)
+            
+            with open(self.config_path, 'r', encoding='utf-8') as file:
+                config = yaml.load(file, Loader=_Loader)
+            _cache_put(key, st, copy.deepcopy(config))
+            return config
+        except yaml.YAMLError as e:
+            raise Exception(f"Error parsing YAML config file: {e}")
+        except Exception as e:
+            raise Exception(f"Error loading config file: {e}")
+    
+    def reload_config(self) -> Dict[str, Any]:
+        """Reload configuration from file"""
+        self.config = self.load_config()
+        self._flat = _flatten(self.config or {})
+        return self.config
+    
+    def get(self, key_path: str, default=None):
+        """Get configuration value using dot notation (e.g., 'face_detection.confidence_threshold')"""
+        return self._flat.get(key_path, default)
+    
+    def get_face_detection_config(self) -> Dict[str, Any]:
+        """Get face detection configuration"""
+        return self.config.get('face_detection', {})
+    
+    def get_face_recognition_config(self) -> Dict[str, Any]:
+        """Get face recognition configuration"""
+        return self.config.get('face_recognition', {})
+    
+    def get_camera_config(self) -> Dict[str, Any]:
+        """Get camera configuration"""
+        return self.config.get('camera', {})
+    
+    def get_display_config(self) -> Dict[str, Any]:
+        """Get display configuration"""
+        return self.config.get('display', {})
+    
+    def get_colors_config(self) -> Dict[str, Any]:
+        """Get colors configuration"""
+        return self.config.get('colors', {})
+    
+    def update_config(self, key_path: str, value: Any):
+        """Update configuration value and save to file"""
+        keys = key_path.split('.')
+        config = self.config
+        
+        # Navigate to the parent of the target key
+        for key in keys[:-1]:
+            if key not in config:
+                config[key] = {}
+            config = config[key]
+        
+        # Set the final value
+        config[keys[-1]] = value
+        self._flat = _flatten(self.config)
+        
+        # Save to file
+        self.save_config()
+    
+    def save_config(self):
+        """Save current configuration to file"""
+        try:
+            with open(self.config_path, 'w', encoding='utf-8') as file:
+                yaml.dump(self.config, file, Dumper=_Dumper, default_flow_style=False, sort_keys=False)
+            _cache_put(os.path.abspath(self.config_path), os.stat(self.config_path), copy.deepcopy(self.config))
+        except Exception as e:
+            raise Exception(f"Error saving config file: {e}")
+    
+    def __getitem__(self, key):
+        """Allow dictionary-style access"""
+        return self.config[key]
+    
+    def __contains__(self, key):
+        """Allow 'in' operator"""
+        return key in self.config
@@ -1,70 +1,332 @@
-import json
-import numpy as np
-from typing import Optional, Tuple, List
-import os
-
-class DatabaseManager:
-    def __init__(self, json_path):
-        self.json_path = json_path
-        self.data = {}
-        self.load_database()
-    
-    def load_database(self):
-        """Load the face embeddings from JSON file (silent)"""
-        try:
-            if os.path.exists(self.json_path):
-                with open(self.json_path, 'r') as f:
-                    self.data = json.load(f)
-            else:
-                self.data = {}
-        except:
-            self.data = {}
-    
-    def find_similar_face(self, query_embedding: np.ndarray, threshold: float = 0.60) -> Optional[Tuple[str, str, float]]:
-        """Find similar face in JSON database (silent)"""
-        try:
-            if not self.data:
-                return None
-            
-            best_match = None
-            best_similarity = 0
-            
-            for person_name, person_data in self.data.items():
-                stored_embedding = np.array(person_data["mean_embedding"])
-                similarity = self.cosine_similarity(query_embedding, stored_embedding)
-                
-                if similarity > best_similarity:
-                    best_similarity = similarity
-                    if similarity >= threshold:
-                        best_match = (person_name, person_name, similarity)
-            
-            return best_match
-        except:
-            return None
-    
-    def cosine_similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
-        """Calculate cosine similarity (silent)"""
-        try:
-            dot_product = np.dot(embedding1, embedding2)
-            norm1 = np.linalg.norm(embedding1)
-            norm2 = np.linalg.norm(embedding2)
-            
-            if norm1 == 0 or norm2 == 0:
-                return 0
-            
-            return dot_product / (norm1 * norm2)
-        except:
-            return 0
-    
-    def get_all_persons(self) -> List[str]:
-        """Get all persons (silent)"""
-        try:
-            return list(self.data.keys())
-        except:
-            return []
-    
-    def get_person_info(self, person_name: str):
-        """Get person info (silent)"""
-        if person_name in self.data:
-            return self.data[person_name]
+import json
+import numpy as np
+from typing import Optional, Tuple, List
+import os
+import mmap
+import tempfile
+
+try:
+    import simsimd
+except ImportError:
+    simsimd = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = range
+
+def _cosine_rows_i8(matrix: np.ndarray, queries: np.ndarray, out: np.ndarray):
+    """Cosine of int8 queries against every int8 row, dot and both norms in one pass"""
+    n, d = matrix.shape
+    for b in range(queries.shape[0]):
+        for i in prange(n):
+            dot = np.int32(0)
+            norm_q = np.int32(0)
+            norm_p = np.int32(0)
+            for j in range(d):
+                q = np.int32(queries[b, j])
+                p = np.int32(matrix[i, j])
+                dot += q * p
+                norm_q += q * q
+                norm_p += p * p
+            
+            if norm_q == 0 or norm_p == 0:
+                out[b, i] = 0.0
+            else:
+                out[b, i] = dot / np.sqrt(np.float64(norm_q) * np.float64(norm_p))
+
+# Rows are quantized with a per-row scale, so they cannot be pre-normalized
+_cosine_rows_i8_kernel = njit(cache=True, fastmath=True, parallel=True)(_cosine_rows_i8) if njit is not None else None
+
+def quantize_int8(embeddings: np.ndarray) -> np.ndarray:
+    """Scale each vector so its largest component maps to 127 and round to int8"""
+    peak = np.max(np.abs(embeddings), axis=-1, keepdims=True).clip(min=1e-12)
+    return np.round(embeddings * (127.0 / peak)).astype(np.int8)
+
+class DatabaseManager:
+    # int8 matches this close to the threshold are re-scored in float32
+    RERANK_MARGIN = 0.02
+    # From this many persons, queries go through an approximate HNSW index (needs faiss)
+    HNSW_MIN_PERSONS = 1000
+    HNSW_NEIGHBORS = 32
+    HNSW_EF_SEARCH = 64
+    
+    def __init__(self, json_path, precision: str = "float32"):
+        self.json_path = json_path
+        # Binary sidecar holding the normalized embedding matrix, plus its row names
+        self.matrix_path = os.path.splitext(json_path)[0] + ".npy"
+        self.names_path = os.path.splitext(json_path)[0] + ".names.json"
+        self.precision = precision
+        self._data = None
+        self._names = []
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._matrix_i8 = None
+        self._matrix_f16 = None
+        self._index = None
+        self.load_database()
+    
+    @property
+    def data(self) -> dict:
+        """Person records from the JSON file, parsed on first use"""
+        if self._data is None:
+            self._data = self.read_json()
+        return self._data
+    
+    def read_json(self) -> dict:
+        """Parse the JSON database (silent)"""
+        try:
+            if os.path.exists(self.json_path):
+                with open(self.json_path, 'rb') as f:
+                    raw = f.read()
+                return orjson.loads(raw) if orjson is not None else json.loads(raw)
+        except:
+            pass
+        return {}
+    
+    def load_database(self):
+        """Load the face embeddings; the JSON is only parsed when the sidecars are stale (silent)"""
+        self._data = None
+        self.build_matrix()
+    
+    def build_matrix(self):
+        """Stack mean embeddings into an L2-normalized (N, D) float32 matrix (silent)"""
+        try:
+            # Stamp the JSON before reading it, so a concurrent rewrite leaves a mismatch
+            source = self.json_stamp()
+            sidecar = self.load_matrix_sidecar(source)
+            if sidecar is not None:
+                self._names, self._matrix = sidecar
+            else:
+                self._names = list(self.data.keys())
+                if not self._names:
+                    self._matrix = np.empty((0, 0), dtype=np.float32)
+                    return
+                
+                matrix = np.stack([np.asarray(person_data["mean_embedding"], dtype=np.float32)
+                                   for person_data in self.data.values()])
+                matrix /= np.linalg.norm(matrix, axis=1, keepdims=True).clip(min=1e-12)
+                self._matrix = np.ascontiguousarray(matrix)
+                self.save_matrix_sidecar(source)
+            
+            # int8 copy is a quarter of the size; cosine ignores the per-row scale
+            self._matrix_i8 = quantize_int8(self._matrix) if self.precision == "int8" else None
+            if self.quantized and simsimd is None:
+                # Compile (or load from numba's cache) now, not on the first recognized face
+                _cosine_rows_i8_kernel(self._matrix_i8, self._matrix_i8[:1], np.empty((1, len(self._matrix_i8)), dtype=np.float32))
+            # float16 copy halves the bytes scanned per query; only simsimd has f16 kernels
+            use_f16 = self.precision == "float16" and simsimd is not None
+            self._matrix_f16 = self._matrix.astype(np.float16) if use_f16 else None
+            self._index = self.build_index()
+        except:
+            self._names = []
+            self._matrix = np.empty((0, 0), dtype=np.float32)
+            self._matrix_i8 = None
+            self._matrix_f16 = None
+            self._index = None
+    
+    def build_index(self):
+        """HNSW inner-product index over the normalized matrix for large databases (silent)"""
+        if faiss is None or len(self._names) < self.HNSW_MIN_PERSONS:
+            return None
+        try:
+            index = faiss.IndexHNSWFlat(self._matrix.shape[1], self.HNSW_NEIGHBORS, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efSearch = self.HNSW_EF_SEARCH
+            index.add(np.ascontiguousarray(self._matrix))
+            return index
+        except:
+            return None
+    
+    def json_stamp(self) -> Optional[List[int]]:
+        """(st_mtime_ns, st_size) of the JSON database, or None if it is missing"""
+        try:
+            st = os.stat(self.json_path)
+            return [st.st_mtime_ns, st.st_size]
+        except OSError:
+            return None
+    
+    def load_matrix_sidecar(self, source) -> Optional[Tuple[List[str], np.ndarray]]:
+        """Memory-map the embedding sidecar if it was built from exactly this JSON (silent)"""
+        try:
+            # An exact stamp match, not "newer than": a JSON copied in with its old
+            # mtime preserved (cp -p, rsync -a, unzip, backups) must still rebuild
+            if source is None or not os.path.exists(self.names_path):
+                return None
+            with open(self.names_path, 'rb') as f:
+                sidecar = json.loads(f.read())
+            if not isinstance(sidecar, dict) or sidecar.get('source') != source:
+                return None
+            
+            names = sidecar['names']
+            matrix = np.load(self.matrix_path, mmap_mode='r')
+            if matrix.dtype != np.float32 or matrix.ndim != 2 or matrix.shape[0] != len(names):
+                return None
+            
+            # Every query scans all rows, so ask the kernel to page the file in now
+            mapping = getattr(matrix, '_mmap', None)
+            if mapping is not None and hasattr(mmap, 'MADV_WILLNEED'):
+                mapping.madvise(mmap.MADV_WILLNEED)
+            return names, matrix
+        except:
+            return None
+    
+    def save_matrix_sidecar(self, source):
+        """Write the normalized embedding matrix and its names next to the JSON (silent)"""
+        if source is None:
+            return
+        try:
+            # Matrix first: the names file carries the JSON stamp, so it is only
+            # trusted once the matrix it describes is fully in place
+            self.write_atomic(self.matrix_path, lambda f: np.save(f, self._matrix))
+            sidecar = {'source': source, 'names': self._names}
+            self.write_atomic(self.names_path, lambda f: f.write(json.dumps(sidecar).encode('utf-8')))
+        except:
+            pass
+    
+    def write_atomic(self, path, write):
+        """Write through a temp file and rename it over path, so readers never see a partial file"""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+    
+    @property
+    def backend(self) -> str:
+        """Name of the kernel used to score queries"""
+        if self._index is not None:
+            return f"faiss (HNSW inner product, {len(self._names)} persons)"
+        if simsimd is None:
+            return "numba (int8 fused cosine)" if self.quantized else "numpy (BLAS float32)"
+        
+        # simsimd picks the kernel for each call at runtime; these are only the
+        # SIMD capabilities it can choose from on this CPU, not the one in use
+        capabilities = [name for name, enabled in simsimd.get_capabilities().items() if enabled]
+        kernel = "int8" if self.quantized else "float16" if self._matrix_f16 is not None else "float32"
+        return f"simsimd ({kernel}; CPU capabilities: {', '.join(capabilities) or 'serial'})"
+    
+    def find_similar_face(self, query_embedding: np.ndarray, threshold: float = 0.60) -> Optional[Tuple[str, str, float]]:
+        """Find similar face in JSON database (silent)"""
+        try:
+            return self.find_similar_faces(np.reshape(query_embedding, (1, -1)), threshold)[0]
+        except:
+            return None
+    
+    def find_similar_faces(self, query_embeddings: np.ndarray, threshold: float = 0.60) -> List[Optional[Tuple[str, str, float]]]:
+        """Find similar faces for a (B, D) batch of embeddings in one pass (silent)"""
+        try:
+            queries = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+            if not self._names:
+                return [None] * len(queries)
+            
+            norms = np.linalg.norm(queries, axis=1)
+            if self._index is not None:
+                # Rows are unit length, so inner product on normalized queries is cosine
+                scores, best = self._index.search(queries / norms.clip(min=1e-12)[:, None], 1)
+                return [None if norms[row] == 0 or best[row, 0] < 0 or scores[row, 0] < threshold
+                        else (self._names[best[row, 0]], self._names[best[row, 0]], float(scores[row, 0]))
+                        for row in range(len(queries))]
+            
+            # Scores every query against every person as one (B, N) product
+            scores = self.score_all(queries, norms)
+            best = scores.argmax(axis=1)
+            
+            if self.quantized:
+                # Quantization error only matters near the decision boundary
+                best_scores = scores[np.arange(len(best)), best]
+                near = np.flatnonzero(np.abs(best_scores - threshold) <= self.RERANK_MARGIN)
+                if len(near):
+                    scores[near] = self.score_all(queries[near], norms[near], quantized=False)
+                    best[near] = scores[near].argmax(axis=1)
+            
+            matches = []
+            for row, idx in enumerate(best):
+                similarity = float(scores[row, idx])
+                if norms[row] == 0 or similarity < threshold:
+                    matches.append(None)
+                else:
+                    person_name = self._names[idx]
+                    matches.append((person_name, person_name, similarity))
+            return matches
+        except:
+            return [None] * len(query_embeddings)
+    
+    @property
+    def quantized(self) -> bool:
+        """True when queries are scored against the int8 matrix"""
+        has_kernel = simsimd is not None or _cosine_rows_i8_kernel is not None
+        return has_kernel and self._matrix_i8 is not None
+    
+    def score_all(self, queries: np.ndarray, norms: np.ndarray, quantized: bool = True) -> np.ndarray:
+        """Cosine similarity of (B, D) float32 queries against every stored person"""
+        if quantized and self.quantized:
+            # int8 kernel (VNNI where available) over the quantized matrix
+            queries_i8 = quantize_int8(queries)
+            if simsimd is None:
+                scores = np.empty((len(queries), len(self._matrix_i8)), dtype=np.float32)
+                _cosine_rows_i8_kernel(self._matrix_i8, queries_i8, scores)
+                return scores
+            distances = np.asarray(simsimd.cdist(queries_i8, self._matrix_i8, metric="cosine"))
+            return 1.0 - distances
+        
+        if self._matrix_f16 is not None:
+            # Half the memory traffic; f16 rounding (~1e-3) is far below the threshold margin
+            distances = np.asarray(simsimd.cdist(queries.astype(np.float16), self._matrix_f16, metric="cosine"))
+            return 1.0 - distances
+        
+        if simsimd is not None:
+            # Fused SIMD kernel: dot product and norms in a single pass
+            distances = np.asarray(simsimd.cdist(queries, self._matrix, metric="cosine"))
+            return 1.0 - distances
+        
+        # BLAS fallback (also used for int8 without simsimd or numba, since NumPy
+        # has no integer BLAS): one matrix product over the normalized rows
+        return (queries / norms.clip(min=1e-12)[:, None]) @ self._matrix.T
+    
+    def cosine_similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
+        """Calculate cosine similarity (silent)"""
+        try:
+            if simsimd is not None:
+                embedding1 = np.ascontiguousarray(embedding1, dtype=np.float32)
+                embedding2 = np.ascontiguousarray(embedding2, dtype=np.float32)
+                return 1.0 - float(simsimd.cosine(embedding1, embedding2))
+            
+            dot_product = np.dot(embedding1, embedding2)
+            norm1 = np.linalg.norm(embedding1)
+            norm2 = np.linalg.norm(embedding2)
+            
+            if norm1 == 0 or norm2 == 0:
+                return 0
+            
+            return dot_product / (norm1 * norm2)
+        except:
+            return 0
+    
+    def get_all_persons(self) -> List[str]:
+        """Get all persons (silent)"""
+        try:
+            return list(self.data.keys())
+        except:
+            return []
+    
+    def get_person_info(self, person_name: str):
+        """Get person info (silent)"""
+        if person_name in self.data:
+            return self.data[person_name]
         return None
\ No newline at end of file
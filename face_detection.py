@@ -1,511 +1,796 @@
-import cv2
-import numpy as np
-import os
-import threading
-import time
-from ultralytics import YOLO
-from queue import Queue
-import pickle
-
-class FaceDetector:
-    def __init__(self, model_path, save_folder, config_manager=None):
-        self.model = YOLO(model_path)
-        self.save_folder = save_folder
-        self.config_manager = config_manager
-        
-        # Load configuration values
-        if config_manager:
-            self.confidence_threshold = config_manager.get('face_detection.confidence_threshold', 0.6)
-            self.unknown_folder = config_manager.get('face_detection.unknown_folder', 'unknown_faces')
-            self.camera_device_id = config_manager.get('camera.device_id', 0)
-            self.camera_width = config_manager.get('camera.resolution.width', 640)
-            self.camera_height = config_manager.get('camera.resolution.height', 480)
-            self.camera_fps = config_manager.get('camera.fps', 30)
-            self.max_images_per_folder = config_manager.get('face_detection.max_images_per_folder', 10)
-            
-            # Display settings
-            self.window_name = config_manager.get('display.window_name', 'Face Recognition')
-            self.show_confidence = config_manager.get('display.show_confidence', True)
-            self.show_bounding_box = config_manager.get('display.show_bounding_box', True)
-            self.font_scale = config_manager.get('display.font_scale', 0.6)
-            self.font_thickness = config_manager.get('display.font_thickness', 2)
-            self.box_thickness = config_manager.get('display.box_thickness', 2)
-            
-            # Colors
-            self.known_face_color = tuple(config_manager.get('colors.known_face_box', [0, 255, 0]))
-            self.unknown_face_color = tuple(config_manager.get('colors.unknown_face_box', [0, 0, 255]))
-            self.text_bg_color = tuple(config_manager.get('colors.text_background', [0, 0, 0]))
-            self.text_color = tuple(config_manager.get('colors.text_color', [255, 255, 255]))
-        else:
-            # Default values
-            self.confidence_threshold = 0.6
-            self.unknown_folder = "unknown_faces"
-            self.camera_device_id = 0
-            self.camera_width = 640
-            self.camera_height = 480
-            self.camera_fps = 30
-            self.max_images_per_folder = 10
-            self.window_name = "Face Recognition"
-            self.show_confidence = True
-            self.show_bounding_box = True
-            self.font_scale = 0.6
-            self.font_thickness = 2
-            self.box_thickness = 2
-            self.known_face_color = (0, 255, 0)
-            self.unknown_face_color = (0, 0, 255)
-            self.text_bg_color = (0, 0, 0)
-            self.text_color = (255, 255, 255)
-        self.face_queue = Queue()
-        self.recognition_results = Queue()
-        self.cleanup_queue = Queue()
-        self.face_arrays = []
-        self.running = False
-        self.face_counter = 0
-        self.saved_faces = {}
-        self.saved_unknown_faces = {}
-        self.current_recognitions = {}
-        
-        # Create save folders if they don't exist
-        os.makedirs(save_folder, exist_ok=True)
-        os.makedirs(self.unknown_folder, exist_ok=True)
-        
-    def detect_faces(self):
-        """Main face detection loop with smart cleanup (silent mode)"""
-        self.running = True
-        cap = cv2.VideoCapture(self.camera_device_id)
-        
-        if not cap.isOpened():
-            print(f"❌ Error: Could not open camera {self.camera_device_id}")
-            return
-        
-        # Set camera resolution and FPS
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.camera_width)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.camera_height)
-        cap.set(cv2.CAP_PROP_FPS, self.camera_fps)
-        
-        print(f"📷 Camera initialized: {self.camera_width}x{self.camera_height} @ {self.camera_fps}fps")
-        
-        # Start cleanup thread
-        cleanup_thread = threading.Thread(target=self.cleanup_worker, daemon=True)
-        cleanup_thread.start()
-        
-        while self.running:
-            ret, frame = cap.read()
-            if not ret:
-                continue
-            
-            # Check for new recognition results and cleanup requests
-            self.update_recognition_results()
-            
-            # Run YOLO detection
-            results = self.model(frame, verbose=False)
-            
-            # Draw face boxes and names
-            display_frame = frame.copy()
-            
-            for result in results:
-                boxes = result.boxes
-                if boxes is not None:
-                    for i, box in enumerate(boxes):
-                        # Get bounding box coordinates
-                        x1, y1, x2, y2 = map(int, box.xyxy[0])
-                        conf = box.conf[0]
-                        
-                        # Only process if confidence is high enough
-                        if conf > self.confidence_threshold:
-                            # Calculate face dimensions
-                            face_width = x2 - x1
-                            face_height = y2 - y1
-                            
-                            # Add generous padding (50% of face size)
-                            padding_x = int(face_width * 0.5)
-                            padding_y = int(face_height * 0.5)
-                            
-                            # Apply padding with bounds checking
-                            x1_padded = max(0, x1 - padding_x)
-                            y1_padded = max(0, y1 - padding_y)
-                            x2_padded = min(frame.shape[1], x2 + padding_x)
-                            y2_padded = min(frame.shape[0], y2 + padding_y)
-                            
-                            # Extract face region with padding
-                            face_img = frame[y1_padded:y2_padded, x1_padded:x2_padded]
-                            
-                            # Check if face is large enough
-                            if (face_img.size > 0 and 
-                                face_img.shape[0] > 100 and 
-                                face_img.shape[1] > 100):
-                                
-                                # Resize face to a standard size for better recognition
-                                face_resized = cv2.resize(face_img, (224, 224))
-                                
-                                # Save original and resized face
-                                face_id = self.save_face(face_img, face_resized)
-                                
-                                # Add resized face to queue for recognition
-                                face_data = {
-                                    'image': face_resized.copy(),
-                                    'face_id': face_id,
-                                    'bbox': (x1, y1, x2, y2),
-                                    'timestamp': time.time()
-                                }
-                                self.face_queue.put(face_data)
-                                
-                                # Draw face rectangle with configured colors
-                                person_name, confidence = self.get_recognition_for_area(x1, y1, x2, y2)
-                                
-                                if self.show_bounding_box:
-                                    # Choose color based on recognition result
-                                    if person_name and person_name != "UNKNOWN":
-                                        color = self.known_face_color
-                                    else:
-                                        color = self.unknown_face_color
-                                    
-                                    cv2.rectangle(display_frame, (x1, y1), (x2, y2), color, self.box_thickness)
-                                
-                                # Check if we have recognition result for this area
-                                if person_name:
-                                    # Display person name and confidence
-                                    label = f"{person_name}"
-                                    confidence_label = f"{confidence:.1f}%" if confidence > 0 and self.show_confidence else ""
-                                    
-                                    # Calculate text size for background
-                                    (text_width, text_height), baseline = cv2.getTextSize(
-                                        label, cv2.FONT_HERSHEY_SIMPLEX, self.font_scale, self.font_thickness)
-                                    (conf_width, conf_height), _ = cv2.getTextSize(
-                                        confidence_label, cv2.FONT_HERSHEY_SIMPLEX, self.font_scale * 0.8, self.font_thickness)
-                                    
-                                    # Draw background rectangles for text
-                                    bg_color = self.known_face_color if person_name != "UNKNOWN" else self.unknown_face_color
-                                    cv2.rectangle(display_frame, 
-                                                (x1, y1 - text_height - 35), 
-                                                (x1 + max(text_width, conf_width) + 10, y1), 
-                                                bg_color, -1)
-                                    
-                                    # Draw person name
-                                    cv2.putText(display_frame, label, 
-                                              (x1 + 5, y1 - 20), 
-                                              cv2.FONT_HERSHEY_SIMPLEX, self.font_scale, self.text_color, self.font_thickness)
-                                    
-                                    # Draw confidence
-                                    if confidence_label:
-                                        cv2.putText(display_frame, confidence_label, 
-                                                  (x1 + 5, y1 - 5), 
-                                                  cv2.FONT_HERSHEY_SIMPLEX, self.font_scale * 0.8, self.text_color, self.font_thickness)
-            
-            # Add minimal system info
-            queue_text = f"Queue: {self.face_queue.qsize()}"
-            cv2.putText(display_frame, queue_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            
-            # Count images in both folders
-            known_count = len([f for f in os.listdir(self.save_folder) if f.endswith('.jpg')])
-            unknown_count = len([f for f in os.listdir(self.unknown_folder) if f.endswith('.jpg')]) if os.path.exists(self.unknown_folder) else 0
-            
-            folder_text = f"Known: {known_count} | Unknown: {unknown_count}"
-            cv2.putText(display_frame, folder_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            
-            cv2.imshow(self.window_name, display_frame)
-            
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-                
-        cap.release()
-        cv2.destroyAllWindows()
-    
-    def cleanup_worker(self):
-        """Worker thread to handle smart file cleanup (silent mode)"""
-        while self.running:
-            try:
-                cleanup_request = self.cleanup_queue.get(timeout=1)
-                face_id = cleanup_request['face_id']
-                person_name = cleanup_request.get('person_name', 'UNKNOWN')
-                
-                if person_name != "UNKNOWN":
-                    self.cleanup_known_faces(face_id, person_name)
-                else:
-                    self.cleanup_unknown_faces(face_id)
-                        
-            except:
-                continue
-                
-        if self.running:
-            self.periodic_cleanup()
-    
-    def cleanup_known_faces(self, face_id, person_name):
-        """Smart cleanup for known/recognized faces (silent)"""
-        current_images = [f for f in os.listdir(self.save_folder) if f.endswith('.jpg')]
-        image_count = len(current_images)
-        
-        # Always delete the processed face images after recognition
-        if face_id in self.saved_faces:
-            files_to_delete = self.saved_faces[face_id]
-            self.delete_face_files(files_to_delete, face_id, "known")
-        
-        # If we have more than max_images_per_folder, delete the oldest ones
-        if image_count > self.max_images_per_folder:
-            self.cleanup_oldest_files(self.save_folder, "known")
-    
-    def cleanup_unknown_faces(self, face_id):
-        """Smart cleanup for unknown faces (silent)"""
-        if not os.path.exists(self.unknown_folder):
-            return
-            
-        current_unknown = [f for f in os.listdir(self.unknown_folder) if f.endswith('.jpg')]
-        unknown_count = len(current_unknown)
-        
-        # Always delete the processed face images after recognition
-        if face_id in self.saved_unknown_faces:
-            files_to_delete = self.saved_unknown_faces[face_id]
-            self.delete_face_files(files_to_delete, face_id, "unknown")
-        
-        # If we have more than max_images_per_folder, delete the oldest ones
-        if unknown_count > self.max_images_per_folder:
-            self.cleanup_oldest_files(self.unknown_folder, "unknown")
-    
-    def delete_face_files(self, file_paths, face_id, face_type):
-        """Delete face image files (silent)"""
-        for file_path in file_paths:
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-            except:
-                pass
-        
-        # Remove from tracking
-        if face_type == "known" and face_id in self.saved_faces:
-            del self.saved_faces[face_id]
-        elif face_type == "unknown" and face_id in self.saved_unknown_faces:
-            del self.saved_unknown_faces[face_id]
-    
-    def cleanup_oldest_files(self, folder_path, folder_type):
-        """Remove oldest files to keep only max_images_per_folder images"""
-        try:
-            files_in_folder = [f for f in os.listdir(folder_path) if f.endswith('.jpg')]
-            
-            if len(files_in_folder) <= self.max_images_per_folder:
-                return
-            
-            # Get files with creation time
-            files_with_time = []
-            for filename in files_in_folder:
-                filepath = os.path.join(folder_path, filename)
-                try:
-                    file_time = os.path.getctime(filepath)
-                    files_with_time.append((filename, filepath, file_time))
-                except:
-                    continue
-            
-            # Sort by creation time (oldest first)
-            files_with_time.sort(key=lambda x: x[2])
-            
-            # Delete oldest files to keep only max_images_per_folder
-            files_to_delete = files_with_time[:-self.max_images_per_folder]
-            
-            for filename, filepath, file_time in files_to_delete:
-                try:
-                    os.remove(filepath)
-                except:
-                    pass
-                    
-        except:
-            pass
-    
-    def update_recognition_results(self):
-        """Update recognition results and handle cleanup (silent)"""
-        while not self.recognition_results.empty():
-            try:
-                result = self.recognition_results.get_nowait()
-                face_id = result['face_id']
-                person_name = result['person_name']
-                confidence = result['confidence']
-                timestamp = result['timestamp']
-                bbox = result['bbox']
-                
-                # Store recognition result
-                self.current_recognitions[face_id] = {
-                    'person_name': person_name,
-                    'confidence': confidence,
-                    'timestamp': timestamp,
-                    'bbox': bbox
-                }
-                
-                # Schedule cleanup based on recognition result
-                cleanup_request = {
-                    'face_id': face_id,
-                    'person_name': person_name
-                }
-                self.cleanup_queue.put(cleanup_request)
-                
-                # Clean old recognition results (older than 3 seconds)
-                current_time = time.time()
-                self.current_recognitions = {
-                    k: v for k, v in self.current_recognitions.items()
-                    if current_time - v['timestamp'] < 3.0
-                }
-                
-            except:
-                break
-    
-    def get_recognition_for_area(self, x1, y1, x2, y2):
-        """Get recognition result for a face area"""
-        best_match = None
-        best_overlap = 0
-        
-        for face_id, result in self.current_recognitions.items():
-            stored_bbox = result['bbox']
-            if stored_bbox:
-                overlap = self.calculate_bbox_overlap((x1, y1, x2, y2), stored_bbox)
-                if overlap > best_overlap and overlap > 0.3:
-                    best_overlap = overlap
-                    best_match = result
-        
-        if best_match:
-            return best_match['person_name'], best_match['confidence']
-        return None, None
-    
-    def calculate_bbox_overlap(self, bbox1, bbox2):
-        """Calculate overlap ratio between two bounding boxes"""
-        x1_1, y1_1, x2_1, y2_1 = bbox1
-        x1_2, y1_2, x2_2, y2_2 = bbox2
-        
-        x1_int = max(x1_1, x1_2)
-        y1_int = max(y1_1, y1_2)
-        x2_int = min(x2_1, x2_2)
-        y2_int = min(y2_1, y2_2)
-        
-        if x2_int <= x1_int or y2_int <= y1_int:
-            return 0
-        
-        intersection = (x2_int - x1_int) * (y2_int - y1_int)
-        area1 = (x2_1 - x1_1) * (y2_1 - y1_1)
-        area2 = (x2_2 - x1_2) * (y2_2 - y1_2)
-        union = area1 + area2 - intersection
-        
-        return intersection / union if union > 0 else 0
-        
-    def save_face(self, face_img, face_resized):
-        """Save detected face to folder (silent)"""
-        self.face_counter += 1
-        face_id = f"face_{self.face_counter}_{int(time.time())}"
-        
-        # Save original face image
-        filename = f"{face_id}.jpg"
-        filepath = os.path.join(self.save_folder, filename)
-        cv2.imwrite(filepath, face_img)
-        
-        # Save resized face image
-        filename_resized = f"{face_id}_resized.jpg"
-        filepath_resized = os.path.join(self.save_folder, filename_resized)
-        cv2.imwrite(filepath_resized, face_resized)
-        
-        # Track saved files
-        self.saved_faces[face_id] = [filepath, filepath_resized]
-        
-        # Store as numpy array (keep limited amount)
-        face_array = {
-            'image': face_img,
-            'image_resized': face_resized,
-            'filename': filename,
-            'face_id': face_id,
-            'timestamp': time.time()
-        }
-        self.face_arrays.append(face_array)
-        
-        # Keep only last 10 numpy arrays in memory
-        if len(self.face_arrays) > 10:
-            self.face_arrays = self.face_arrays[-10:]
-        
-        # Save numpy arrays less frequently
-        if len(self.face_arrays) % 10 == 0:
-            self.save_arrays_to_file()
-            
-        return face_id
-    
-    def save_arrays_to_file(self):
-        """Save face arrays to pickle file (silent)"""
-        arrays_file = os.path.join(self.save_folder, "face_arrays.pkl")
-        with open(arrays_file, 'wb') as f:
-            pickle.dump(self.face_arrays, f)
-    
-    def get_face_queue(self):
-        return self.face_queue
-    
-    def get_recognition_results_queue(self):
-        return self.recognition_results
-    
-    def periodic_cleanup(self):
-        """Periodic cleanup (silent)"""
-        try:
-            current_time = time.time()
-            self.cleanup_old_files_in_folder(self.save_folder, "known", current_time)
-            if os.path.exists(self.unknown_folder):
-                self.cleanup_old_files_in_folder(self.unknown_folder, "unknown", current_time)
-        except:
-            pass
-    
-    def cleanup_old_files_in_folder(self, folder_path, folder_type, current_time):
-        """Cleanup old files in folder (silent)"""
-        try:
-            files_in_folder = [f for f in os.listdir(folder_path) if f.endswith('.jpg')]
-            
-            files_with_time = []
-            for filename in files_in_folder:
-                filepath = os.path.join(folder_path, filename)
-                try:
-                    file_time = os.path.getctime(filepath)
-                    files_with_time.append((filename, filepath, file_time))
-                except:
-                    continue
-            
-            files_with_time.sort(key=lambda x: x[2])
-            
-            # Keep only max_images_per_folder most recent files
-            if len(files_with_time) > self.max_images_per_folder:
-                files_to_delete = files_with_time[:-self.max_images_per_folder]
-                
-                for filename, filepath, file_time in files_to_delete:
-                    try:
-                        os.remove(filepath)
-                    except:
-                        pass
-        except:
-            pass
-    
-    def stop(self):
-        """Stop face detection"""
-        self.running = False
-        self.save_arrays_to_file()
-        self.periodic_cleanup()
-    
-    def reload_config(self):
-        """Reload configuration from config file"""
-        if self.config_manager:
-            try:
-                self.config_manager.reload_config()
-                
-                # Update configuration values
-                self.confidence_threshold = self.config_manager.get('face_detection.confidence_threshold', 0.6)
-                self.camera_width = self.config_manager.get('camera.resolution.width', 640)
-                self.camera_height = self.config_manager.get('camera.resolution.height', 480)
-                self.camera_fps = self.config_manager.get('camera.fps', 30)
-                self.max_images_per_folder = self.config_manager.get('face_detection.max_images_per_folder', 10)
-                
-                # Display settings
-                self.window_name = self.config_manager.get('display.window_name', 'Face Recognition')
-                self.show_confidence = self.config_manager.get('display.show_confidence', True)
-                self.show_bounding_box = self.config_manager.get('display.show_bounding_box', True)
-                self.font_scale = self.config_manager.get('display.font_scale', 0.6)
-                self.font_thickness = self.config_manager.get('display.font_thickness', 2)
-                self.box_thickness = self.config_manager.get('display.box_thickness', 2)
-                
-                # Colors
-                self.known_face_color = tuple(self.config_manager.get('colors.known_face_box', [0, 255, 0]))
-                self.unknown_face_color = tuple(self.config_manager.get('colors.unknown_face_box', [0, 0, 255]))
-                self.text_bg_color = tuple(self.config_manager.get('colors.text_background', [0, 0, 0]))
-                self.text_color = tuple(self.config_manager.get('colors.text_color', [255, 255, 255]))
-                
-                print("🔄 Configuration reloaded successfully!")
-                return True
-            except Exception as e:
-                print(f"❌ Error reloading configuration: {e}")
-                return False
+import cv2
+import numpy as np
+import os
+import threading
+import time
+import torch
+from ultralytics import YOLO
+from insightface.utils import face_align
+from queue import Queue, Empty, Full
+import pickle
+import tempfile
+import heapq
+from collections import deque
+from dataclasses import dataclass
+from face_ring import FaceRing
+
+def _stride_align(size, stride=32):
+    """Round a YOLO input size up to a multiple of the model stride"""
+    return max(stride, -(-int(size) // stride) * stride)
+
+@dataclass(frozen=True, slots=True)
+class DetectorCfg:
+    """Immutable snapshot of the detector settings read from config.yaml"""
+    confidence_threshold: float
+    unknown_folder: str
+    camera_device_id: int
+    camera_width: int
+    camera_height: int
+    camera_fps: int
+    max_images_per_folder: int
+    motion_threshold: float
+    save_resized_debug: bool
+    input_width: int
+    input_height: int
+    half_precision: bool
+    
+    # Display settings
+    window_name: str
+    show_confidence: bool
+    show_bounding_box: bool
+    font_scale: float
+    font_thickness: int
+    box_thickness: int
+    
+    # Colors
+    known_face_color: tuple
+    unknown_face_color: tuple
+    text_bg_color: tuple
+    text_color: tuple
+    
+    @classmethod
+    def from_config_manager(cls, config_manager=None):
+        """Build settings from a ConfigManager, or defaults when it is None"""
+        get = config_manager.get if config_manager else (lambda key_path, default=None: default)
+        return cls(
+            confidence_threshold=get('face_detection.confidence_threshold', 0.6),
+            unknown_folder=get('face_detection.unknown_folder', 'unknown_faces'),
+            camera_device_id=get('camera.device_id', 0),
+            camera_width=get('camera.resolution.width', 640),
+            camera_height=get('camera.resolution.height', 480),
+            camera_fps=get('camera.fps', 30),
+            max_images_per_folder=get('face_detection.max_images_per_folder', 10),
+            motion_threshold=get('face_detection.motion_threshold', 2.0),
+            save_resized_debug=get('face_detection.save_resized_debug', False),
+            # Pre-aligned so Ultralytics does not re-check and warn on every predict
+            input_width=_stride_align(get('face_detection.resolution.input_width', 640)),
+            input_height=_stride_align(get('face_detection.resolution.input_height', 640)),
+            half_precision=get('face_detection.half_precision', True),
+            window_name=get('display.window_name', 'Face Recognition'),
+            show_confidence=get('display.show_confidence', True),
+            show_bounding_box=get('display.show_bounding_box', True),
+            font_scale=get('display.font_scale', 0.6),
+            font_thickness=get('display.font_thickness', 2),
+            box_thickness=get('display.box_thickness', 2),
+            known_face_color=tuple(get('colors.known_face_box', [0, 255, 0])),
+            unknown_face_color=tuple(get('colors.unknown_face_box', [0, 0, 255])),
+            text_bg_color=tuple(get('colors.text_background', [0, 0, 0])),
+            text_color=tuple(get('colors.text_color', [255, 255, 255])),
+        )
+
+class FaceDetector:
+    # Seconds between full directory scans that reconcile the cached image counts
+    COUNT_REFRESH_INTERVAL = 5.0
+    # Seconds between face_arrays.pkl snapshots written by the save worker
+    ARRAYS_SAVE_INTERVAL = 10.0
+    # Face crop slots shared with the recognizer; new faces are dropped while it is full
+    RECOGNITION_RING_SIZE = 32
+    # Face crop handed to the recognizer, at the ArcFace input size
+    ALIGNED_FACE_SIZE = (112, 112)
+    # Without landmarks, a square crop mimicking the ArcFace template margins:
+    # side relative to the longer box edge, centre raised by a fraction of its height
+    TEMPLATE_CROP_SCALE = 1.15
+    TEMPLATE_CROP_SHIFT = 0.07
+    
+    def __init__(self, model_path, save_folder, config_manager=None):
+        self.model = YOLO(model_path)
+        # Fold Conv+BatchNorm layers once instead of on the first prediction
+        self.model.fuse()
+        self.device = 0 if torch.cuda.is_available() else 'cpu'
+        # Resize face crops on the GPU when OpenCV was built with CUDA
+        self.cuda_resize = hasattr(cv2, 'cuda') and cv2.cuda.getCudaEnabledDeviceCount() > 0
+        self.save_folder = save_folder
+        self.config_manager = config_manager
+        
+        # Load configuration values
+        self.cfg = DetectorCfg.from_config_manager(config_manager)
+        self.face_queue = FaceRing(self.RECOGNITION_RING_SIZE, {
+            'image': (224, 224, 3),
+            'aligned': self.ALIGNED_FACE_SIZE[::-1] + (3,),
+        })
+        self.recognition_results = Queue()
+        self.cleanup_queue = Queue()
+        self.save_queue = Queue(maxsize=64)
+        self.display_queue = Queue(maxsize=1)
+        self._save_lock = threading.Lock()
+        self.face_arrays = deque(maxlen=10)  # Keep only last 10 numpy arrays in memory
+        self.running = False
+        self.face_counter = 0
+        self.saved_faces = {}
+        self.saved_unknown_faces = {}
+        self.current_recognitions = {}
+        # Stored recognition bboxes as a (K, 4) array with parallel results
+        self._recog_bboxes = np.empty((0, 4), dtype=np.int32)
+        self._recog_meta = []
+        self._label_metrics = {}
+        
+        # Frame-diff gating: thumbnail of the last frame YOLO ran on
+        self._prev_small = None
+        self._last_results = None
+        
+        # Create save folders if they don't exist
+        os.makedirs(save_folder, exist_ok=True)
+        os.makedirs(self.cfg.unknown_folder, exist_ok=True)
+        
+        # Cached .jpg counts per folder, updated on save/delete
+        self._count_lock = threading.Lock()
+        self.known_count = 0
+        self.unknown_count = 0
+        self._counts_refreshed = 0.0
+        
+        # Per-folder index of saved images: {path: ctime} of live files plus a
+        # min-heap of (ctime, path) so the oldest can be pruned without rescanning.
+        # Heap entries whose path is no longer in the dict are skipped lazily.
+        self._index_lock = threading.Lock()
+        self._file_index = {"known": {}, "unknown": {}}
+        self._file_heaps = {"known": [], "unknown": []}
+        self.refresh_folder_counts()
+        
+    def detect_faces(self):
+        """Main face detection loop with smart cleanup (silent mode)"""
+        self.running = True
+        cap = cv2.VideoCapture(self.cfg.camera_device_id)
+        
+        if not cap.isOpened():
+            print(f"❌ Error: Could not open camera {self.cfg.camera_device_id}")
+            return
+        
+        # Set camera resolution and FPS
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.cfg.camera_width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.cfg.camera_height)
+        cap.set(cv2.CAP_PROP_FPS, self.cfg.camera_fps)
+        
+        print(f"📷 Camera initialized: {self.cfg.camera_width}x{self.cfg.camera_height} @ {self.cfg.camera_fps}fps")
+        
+        # Start cleanup thread
+        cleanup_thread = threading.Thread(target=self.cleanup_worker, daemon=True)
+        cleanup_thread.start()
+        
+        # Start writer thread so disk I/O stays off the capture loop
+        save_thread = threading.Thread(target=self.save_worker, daemon=True)
+        save_thread.start()
+        
+        # Start display thread; it owns the HighGUI window and event loop
+        display_thread = threading.Thread(target=self.display_worker, daemon=True)
+        display_thread.start()
+        
+        while self.running:
+            ret, frame = cap.read()
+            if not ret:
+                continue
+            
+            # Check for new recognition results and cleanup requests
+            self.update_recognition_results()
+            
+            # Run YOLO detection, unless the scene is unchanged since the last run
+            results = self.detect_or_reuse(frame)
+            
+            # Boxes are drawn straight onto the frame, so every face is cropped
+            # first and drawing is deferred until all crops have been taken
+            faces_to_draw = []
+            gpu_frame = None
+            
+            for result in results:
+                boxes = result.boxes
+                # Five facial landmarks per box when the YOLO model is a face-pose model
+                keypoints = getattr(result, 'keypoints', None)
+                landmarks = keypoints.xy.cpu().numpy() if keypoints is not None else None
+                if landmarks is not None and landmarks.shape[1:] != (5, 2):
+                    landmarks = None
+                if boxes is not None:
+                    for i, box in enumerate(boxes):
+                        # Get bounding box coordinates
+                        x1, y1, x2, y2 = map(int, box.xyxy[0])
+                        conf = box.conf[0]
+                        
+                        # Only process if confidence is high enough
+                        if conf > self.cfg.confidence_threshold:
+                            # Calculate face dimensions
+                            face_width = x2 - x1
+                            face_height = y2 - y1
+                            
+                            # Add generous padding (50% of face size)
+                            padding_x = int(face_width * 0.5)
+                            padding_y = int(face_height * 0.5)
+                            
+                            # Apply padding with bounds checking
+                            x1_padded = max(0, x1 - padding_x)
+                            y1_padded = max(0, y1 - padding_y)
+                            x2_padded = min(frame.shape[1], x2 + padding_x)
+                            y2_padded = min(frame.shape[0], y2 + padding_y)
+                            
+                            # Extract face region with padding
+                            face_img = frame[y1_padded:y2_padded, x1_padded:x2_padded]
+                            
+                            # Check if face is large enough
+                            if (face_img.size > 0 and 
+                                face_img.shape[0] > 100 and 
+                                face_img.shape[1] > 100):
+                                
+                                # Recognizer is behind: drop the face before it is
+                                # saved, so no file is written that nothing will clean up
+                                if not self.face_queue.full():
+                                    # Resize face to a standard size for better recognition
+                                    if self.cuda_resize:
+                                        # Upload the frame once, then crop and resize on the device
+                                        if gpu_frame is None:
+                                            gpu_frame = cv2.cuda_GpuMat()
+                                            gpu_frame.upload(frame)
+                                        gpu_face = cv2.cuda_GpuMat(gpu_frame, (x1_padded, y1_padded,
+                                                                               x2_padded - x1_padded,
+                                                                               y2_padded - y1_padded))
+                                        face_resized = cv2.cuda.resize(gpu_face, (224, 224)).download()
+                                    else:
+                                        face_resized = cv2.resize(face_img, (224, 224))
+                                
+                                    # ArcFace-aligned crop, so the recognizer thread only runs
+                                    # the network and the database search
+                                    if landmarks is not None:
+                                        face_aligned = face_align.norm_crop(frame, landmarks[i],
+                                                                            image_size=self.ALIGNED_FACE_SIZE[0])
+                                    else:
+                                        face_aligned = self.template_crop(frame, x1, y1, x2, y2)
+                                
+                                    # Save original and resized face
+                                    face_id = self.save_face(face_img, face_resized)
+                                
+                                    # Hand the faces to the recognizer; the ring copies
+                                    # them into preallocated slots. This thread is the only
+                                    # producer, so the ring cannot fill up after full() above
+                                    face_data = {
+                                        'image': face_resized,
+                                        'aligned': face_aligned,
+                                        'face_id': face_id,
+                                        'bbox': (x1, y1, x2, y2),
+                                        'timestamp': time.time()
+                                    }
+                                    self.face_queue.put_nowait(face_data)
+                                
+                                faces_to_draw.append((x1, y1, x2, y2))
+            
+            # Draw face boxes and names
+            for x1, y1, x2, y2 in faces_to_draw:
+                self.draw_face(frame, x1, y1, x2, y2)
+            
+            # Add minimal system info
+            queue_text = f"Queue: {self.face_queue.qsize()}"
+            cv2.putText(frame, queue_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            
+            # Image counts are cached; rescan only to reconcile drift (e.g. files
+            # written by the recognizer into the unknown folder)
+            if time.time() - self._counts_refreshed > self.COUNT_REFRESH_INTERVAL:
+                self.refresh_folder_counts()
+            
+            folder_text = f"Known: {self.known_count} | Unknown: {self.unknown_count}"
+            cv2.putText(frame, folder_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            
+            # Hand only the latest frame to the display thread
+            try:
+                self.display_queue.get_nowait()
+            except Empty:
+                pass
+            try:
+                self.display_queue.put_nowait(frame)
+            except Full:
+                pass
+                
+        cap.release()
+        display_thread.join(timeout=1)
+    
+    def display_worker(self):
+        """Worker thread that shows frames and handles the quit key"""
+        while self.running:
+            try:
+                frame = self.display_queue.get(timeout=0.1)
+            except Empty:
+                continue
+            
+            cv2.imshow(self.cfg.window_name, frame)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                self.running = False
+        
+        cv2.destroyAllWindows()
+    
+    def detect_or_reuse(self, frame):
+        """Run YOLO on the frame, or reuse the last detections if nothing moved"""
+        small = cv2.cvtColor(cv2.resize(frame, (80, 60)), cv2.COLOR_BGR2GRAY)
+        
+        if (self.cfg.motion_threshold > 0 and
+            self._last_results is not None and
+            self._prev_small is not None and
+            cv2.absdiff(small, self._prev_small).mean() < self.cfg.motion_threshold):
+            return self._last_results
+        
+        # Compare against the frame YOLO last saw, so slow drift still triggers a run
+        self._last_results = self.model(
+            frame,
+            imgsz=(self.cfg.input_height, self.cfg.input_width),
+            half=self.cfg.half_precision and self.device != 'cpu',  # FP16 needs CUDA
+            device=self.device,
+            verbose=False)
+        self._prev_small = small
+        return self._last_results
+    
+    def draw_face(self, frame, x1, y1, x2, y2):
+        """Draw face rectangle, name and confidence for a detected face"""
+        person_name, confidence = self.get_recognition_for_area(x1, y1, x2, y2)
+        
+        if self.cfg.show_bounding_box:
+            # Choose color based on recognition result
+            if person_name and person_name != "UNKNOWN":
+                color = self.cfg.known_face_color
+            else:
+                color = self.cfg.unknown_face_color
+            
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, self.cfg.box_thickness)
+        
+        # Check if we have recognition result for this area
+        if person_name:
+            # Display person name and confidence
+            label = f"{person_name}"
+            confidence_label = f"{confidence:.1f}%" if confidence > 0 and self.cfg.show_confidence else ""
+            
+            # Calculate text size for background
+            (text_width, text_height), baseline = self.text_size(
+                label, self.cfg.font_scale, self.cfg.font_thickness)
+            (conf_width, conf_height), _ = self.text_size(
+                confidence_label, self.cfg.font_scale * 0.8, self.cfg.font_thickness)
+            
+            # Draw background rectangles for text
+            bg_color = self.cfg.known_face_color if person_name != "UNKNOWN" else self.cfg.unknown_face_color
+            cv2.rectangle(frame, 
+                        (x1, y1 - text_height - 35), 
+                        (x1 + max(text_width, conf_width) + 10, y1), 
+                        bg_color, -1)
+            
+            # Draw person name
+            cv2.putText(frame, label, 
+                      (x1 + 5, y1 - 20), 
+                      cv2.FONT_HERSHEY_SIMPLEX, self.cfg.font_scale, self.cfg.text_color, self.cfg.font_thickness)
+            
+            # Draw confidence
+            if confidence_label:
+                cv2.putText(frame, confidence_label, 
+                          (x1 + 5, y1 - 5), 
+                          cv2.FONT_HERSHEY_SIMPLEX, self.cfg.font_scale * 0.8, self.cfg.text_color, self.cfg.font_thickness)
+    
+    def text_size(self, text, font_scale, thickness):
+        """cv2.getTextSize with a small cache keyed by (text, scale, thickness)"""
+        key = (text, font_scale, thickness)
+        metrics = self._label_metrics.get(key)
+        if metrics is None:
+            if len(self._label_metrics) >= 512:
+                self._label_metrics.clear()
+            metrics = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+            self._label_metrics[key] = metrics
+        return metrics
+    
+    def cleanup_worker(self):
+        """Worker thread to handle smart file cleanup (silent mode)"""
+        while self.running:
+            try:
+                # Block for one request, then drain whatever else has queued up
+                batch = [self.cleanup_queue.get(timeout=1)]
+                while True:
+                    try:
+                        batch.append(self.cleanup_queue.get_nowait())
+                    except Empty:
+                        break
+                
+                known_ids = []
+                unknown_ids = []
+                for cleanup_request in batch:
+                    if cleanup_request.get('person_name', 'UNKNOWN') != "UNKNOWN":
+                        known_ids.append(cleanup_request['face_id'])
+                    else:
+                        unknown_ids.append(cleanup_request['face_id'])
+                
+                if known_ids:
+                    self.cleanup_known_batch(known_ids)
+                if unknown_ids:
+                    self.cleanup_unknown_batch(unknown_ids)
+                        
+            except:
+                continue
+                
+        if self.running:
+            self.periodic_cleanup()
+    
+    def cleanup_known_faces(self, face_id, person_name):
+        """Smart cleanup for known/recognized faces (silent)"""
+        self.cleanup_known_batch([face_id])
+    
+    def cleanup_unknown_faces(self, face_id):
+        """Smart cleanup for unknown faces (silent)"""
+        self.cleanup_unknown_batch([face_id])
+    
+    def cleanup_known_batch(self, face_ids):
+        """Delete processed known faces, then prune the folder once (silent)"""
+        image_count = self.known_count
+        
+        # Always delete the processed face images after recognition
+        for face_id in face_ids:
+            if face_id in self.saved_faces:
+                files_to_delete = self.saved_faces[face_id]
+                self.delete_face_files(files_to_delete, face_id, "known")
+        
+        # If we have more than max_images_per_folder, delete the oldest ones
+        if image_count > self.cfg.max_images_per_folder:
+            self.cleanup_oldest_files(self.save_folder, "known")
+    
+    def cleanup_unknown_batch(self, face_ids):
+        """Delete processed unknown faces, then prune the folder once (silent)"""
+        if not os.path.exists(self.cfg.unknown_folder):
+            return
+            
+        unknown_count = self.unknown_count
+        
+        # Always delete the processed face images after recognition
+        for face_id in face_ids:
+            if face_id in self.saved_unknown_faces:
+                files_to_delete = self.saved_unknown_faces[face_id]
+                self.delete_face_files(files_to_delete, face_id, "unknown")
+        
+        # If we have more than max_images_per_folder, delete the oldest ones
+        if unknown_count > self.cfg.max_images_per_folder:
+            self.cleanup_oldest_files(self.cfg.unknown_folder, "unknown")
+    
+    def delete_face_files(self, file_paths, face_id, face_type):
+        """Delete face image files (silent)"""
+        removed = 0
+        for file_path in file_paths:
+            self.unindex_file(face_type, file_path)
+            try:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                    removed += 1
+            except:
+                pass
+        self.adjust_count(face_type, -removed)
+        
+        # Remove from tracking
+        if face_type == "known":
+            with self._save_lock:
+                self.saved_faces.pop(face_id, None)
+        elif face_type == "unknown" and face_id in self.saved_unknown_faces:
+            del self.saved_unknown_faces[face_id]
+    
+    def cleanup_oldest_files(self, folder_path, folder_type):
+        """Remove oldest files to keep only max_images_per_folder images"""
+        files_to_delete = []
+        with self._index_lock:
+            index = self._file_index[folder_type]
+            heap = self._file_heaps[folder_type]
+            while len(index) > self.cfg.max_images_per_folder and heap:
+                file_time, filepath = heapq.heappop(heap)
+                if index.get(filepath) != file_time:
+                    continue  # stale entry for a file that was already deleted
+                del index[filepath]
+                files_to_delete.append(filepath)
+        
+        removed = 0
+        for filepath in files_to_delete:
+            try:
+                os.remove(filepath)
+                removed += 1
+            except:
+                pass
+        self.adjust_count(folder_type, -removed)
+    
+    def index_file(self, folder_type, filepath, file_time):
+        """Add a saved image to the folder index"""
+        with self._index_lock:
+            self._file_index[folder_type][filepath] = file_time
+            heapq.heappush(self._file_heaps[folder_type], (file_time, filepath))
+    
+    def unindex_file(self, folder_type, filepath):
+        """Drop an image from the folder index; its heap entry goes stale"""
+        with self._index_lock:
+            self._file_index[folder_type].pop(filepath, None)
+    
+    def rebuild_file_index(self, folder_path, folder_type):
+        """Rebuild a folder index from a single directory scan, return its size"""
+        index = {}
+        try:
+            with os.scandir(folder_path) as it:
+                for entry in it:
+                    if entry.name.endswith('.jpg'):
+                        try:
+                            index[entry.path] = entry.stat().st_ctime
+                        except OSError:
+                            continue
+        except OSError:
+            pass
+        
+        heap = [(file_time, filepath) for filepath, file_time in index.items()]
+        heapq.heapify(heap)
+        with self._index_lock:
+            self._file_index[folder_type] = index
+            self._file_heaps[folder_type] = heap
+        return len(index)
+    
+    def refresh_folder_counts(self):
+        """Rescan both folders, rebuilding the file indexes and cached counts"""
+        known_count = self.rebuild_file_index(self.save_folder, "known")
+        unknown_count = self.rebuild_file_index(self.cfg.unknown_folder, "unknown")
+        with self._count_lock:
+            self.known_count = known_count
+            self.unknown_count = unknown_count
+            self._counts_refreshed = time.time()
+    
+    def adjust_count(self, folder_type, delta):
+        """Apply a save/delete delta to the cached image count of a folder"""
+        if not delta:
+            return
+        with self._count_lock:
+            if folder_type == "known":
+                self.known_count = max(0, self.known_count + delta)
+            else:
+                self.unknown_count = max(0, self.unknown_count + delta)
+    
+    def update_recognition_results(self):
+        """Update recognition results and handle cleanup (silent)"""
+        updated = False
+        while not self.recognition_results.empty():
+            try:
+                result = self.recognition_results.get_nowait()
+                
+                # Store recognition result (a RecogResult from the recognizer)
+                self.current_recognitions[result.face_id] = result
+                
+                # Schedule cleanup based on recognition result
+                cleanup_request = {
+                    'face_id': result.face_id,
+                    'person_name': result.person_name
+                }
+                self.cleanup_queue.put(cleanup_request)
+                
+                # Clean old recognition results (older than 3 seconds)
+                current_time = time.time()
+                self.current_recognitions = {
+                    k: v for k, v in self.current_recognitions.items()
+                    if current_time - v.timestamp < 3.0
+                }
+                updated = True
+                
+            except:
+                break
+        
+        if updated:
+            self.rebuild_recognition_bboxes()
+    
+    def rebuild_recognition_bboxes(self):
+        """Pack stored recognition bboxes into an array for vectorized IoU"""
+        meta = [result for result in self.current_recognitions.values() if result.bbox]
+        self._recog_meta = meta
+        if meta:
+            self._recog_bboxes = np.array([result.bbox for result in meta], dtype=np.int32).reshape(-1, 4)
+        else:
+            self._recog_bboxes = np.empty((0, 4), dtype=np.int32)
+    
+    def get_recognition_for_area(self, x1, y1, x2, y2):
+        """Get recognition result for a face area"""
+        bboxes = self._recog_bboxes
+        if len(bboxes) == 0:
+            return None, None
+        
+        # IoU of the query box against every stored box at once
+        x1_int = np.maximum(bboxes[:, 0], x1)
+        y1_int = np.maximum(bboxes[:, 1], y1)
+        x2_int = np.minimum(bboxes[:, 2], x2)
+        y2_int = np.minimum(bboxes[:, 3], y2)
+        intersection = np.clip(x2_int - x1_int, 0, None) * np.clip(y2_int - y1_int, 0, None)
+        
+        areas = (bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])
+        union = areas + (x2 - x1) * (y2 - y1) - intersection
+        overlap = np.where(union > 0, intersection / np.maximum(union, 1), 0.0)
+        
+        idx = int(overlap.argmax())
+        if overlap[idx] > 0.3:
+            best_match = self._recog_meta[idx]
+            return best_match.person_name, best_match.confidence
+        return None, None
+    
+    def calculate_bbox_overlap(self, bbox1, bbox2):
+        """Calculate overlap ratio between two bounding boxes"""
+        x1_1, y1_1, x2_1, y2_1 = bbox1
+        x1_2, y1_2, x2_2, y2_2 = bbox2
+        
+        x1_int = max(x1_1, x1_2)
+        y1_int = max(y1_1, y1_2)
+        x2_int = min(x2_1, x2_2)
+        y2_int = min(y2_1, y2_2)
+        
+        if x2_int <= x1_int or y2_int <= y1_int:
+            return 0
+        
+        intersection = (x2_int - x1_int) * (y2_int - y1_int)
+        area1 = (x2_1 - x1_1) * (y2_1 - y1_1)
+        area2 = (x2_2 - x1_2) * (y2_2 - y1_2)
+        union = area1 + area2 - intersection
+        
+        return intersection / union if union > 0 else 0
+        
+    def template_crop(self, frame, x1, y1, x2, y2):
+        """Square, aspect-preserving face crop with ArcFace template margins"""
+        width, height = self.ALIGNED_FACE_SIZE
+        side = self.TEMPLATE_CROP_SCALE * max(x2 - x1, y2 - y1)
+        scale = width / side
+        cx = (x1 + x2) / 2
+        cy = (y1 + y2) / 2 - self.TEMPLATE_CROP_SHIFT * (y2 - y1)
+        # Pure scale and translate; parts outside the frame come out black
+        M = np.array([[scale, 0, width / 2 - scale * cx],
+                      [0, scale, height / 2 - scale * cy]], dtype=np.float32)
+        return cv2.warpAffine(frame, M, (width, height), borderValue=0)
+    
+    def save_face(self, face_img, face_resized):
+        """Queue detected face for saving by the writer thread (silent)"""
+        self.face_counter += 1
+        face_id = f"face_{self.face_counter}_{int(time.time())}"
+        
+        # Register the files now, on the capture thread, so a recognition result
+        # that beats the writer still finds the entry to clean up
+        saved_files = self.face_paths(face_id)
+        with self._save_lock:
+            self.saved_faces[face_id] = saved_files
+        
+        # face_img is a view into the frame that is drawn on afterwards
+        try:
+            self.save_queue.put_nowait((face_id, face_img.copy(), face_resized))
+        except Full:
+            with self._save_lock:
+                self.saved_faces.pop(face_id, None)
+            
+        return face_id
+    
+    def face_paths(self, face_id):
+        """File paths write_face produces for a face id"""
+        paths = [os.path.join(self.save_folder, f"{face_id}.jpg")]
+        if self.cfg.save_resized_debug:
+            paths.append(os.path.join(self.save_folder, f"{face_id}_resized.jpg"))
+        return paths
+    
+    def save_worker(self):
+        """Worker thread that writes queued faces to disk (silent mode)"""
+        last_arrays_save = time.time()
+        
+        while self.running or not self.save_queue.empty():
+            try:
+                face_id, face_img, face_resized = self.save_queue.get(timeout=1)
+                self.write_face(face_id, face_img, face_resized)
+            except Empty:
+                pass
+            except:
+                continue
+            
+            # Snapshot numpy arrays on a timer rather than per save
+            if time.time() - last_arrays_save >= self.ARRAYS_SAVE_INTERVAL:
+                self.save_arrays_to_file()
+                last_arrays_save = time.time()
+    
+    def write_face(self, face_id, face_img, face_resized):
+        """Write face image (and optionally the resized copy) and track it (silent)"""
+        # Already recognized and cleaned up before the writer got to it
+        with self._save_lock:
+            saved_files = self.saved_faces.get(face_id)
+        if saved_files is None:
+            return
+        
+        # Save original face image; the resized face already travels to the
+        # recognizer in memory, so writing it to disk is only useful for debugging
+        filename = os.path.basename(saved_files[0])
+        cv2.imwrite(saved_files[0], face_img)
+        if len(saved_files) > 1:
+            cv2.imwrite(saved_files[1], face_resized)
+        
+        # Store as numpy array (keep limited amount); only the small resized
+        # crop is kept, the original is already on disk
+        face_array = {
+            'image_resized': np.ascontiguousarray(face_resized),
+            'filename': filename,
+            'face_id': face_id,
+            'timestamp': time.time()
+        }
+        
+        with self._save_lock:
+            cleaned = face_id not in self.saved_faces
+            if not cleaned:
+                self.face_arrays.append(face_array)
+        
+        # Cleaned up while the files were being written: remove them again
+        if cleaned:
+            for saved_file in saved_files:
+                try:
+                    os.remove(saved_file)
+                except OSError:
+                    pass
+            return
+        
+        file_time = time.time()
+        for saved_file in saved_files:
+            self.index_file("known", saved_file, file_time)
+        self.adjust_count("known", len(saved_files))
+    
+    def save_arrays_to_file(self):
+        """Atomically save face arrays to pickle file (silent)"""
+        arrays_file = os.path.join(self.save_folder, "face_arrays.pkl")
+        with self._save_lock:
+            face_arrays = list(self.face_arrays)
+        
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile('wb', dir=self.save_folder, suffix='.tmp', delete=False) as f:
+                tmp_path = f.name
+                pickle.dump(face_arrays, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, arrays_file)
+        except:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def get_face_queue(self):
+        return self.face_queue
+    
+    def get_recognition_results_queue(self):
+        return self.recognition_results
+    
+    def periodic_cleanup(self):
+        """Periodic cleanup (silent)"""
+        try:
+            current_time = time.time()
+            self.cleanup_old_files_in_folder(self.save_folder, "known", current_time)
+            if os.path.exists(self.cfg.unknown_folder):
+                self.cleanup_old_files_in_folder(self.cfg.unknown_folder, "unknown", current_time)
+        except:
+            pass
+    
+    def cleanup_old_files_in_folder(self, folder_path, folder_type, current_time):
+        """Cleanup old files in folder (silent)"""
+        try:
+            # Pick up files written by other components before pruning
+            self.rebuild_file_index(folder_path, folder_type)
+            self.cleanup_oldest_files(folder_path, folder_type)
+        except:
+            pass
+    
+    def stop(self):
+        """Stop face detection"""
+        self.running = False
+        self.save_arrays_to_file()
+        self.periodic_cleanup()
+    
+    def reload_config(self):
+        """Reload configuration from config file"""
+        if self.config_manager:
+            try:
+                self.config_manager.reload_config()
+                
+                # Update configuration values
+                self.cfg = DetectorCfg.from_config_manager(self.config_manager)
+                os.makedirs(self.cfg.unknown_folder, exist_ok=True)
+                
+                print("🔄 Configuration reloaded successfully!")
+                return True
+            except Exception as e:
+                print(f"❌ Error reloading configuration: {e}")
+                return False
         return False
\ No newline at end of file
@@ -1,167 +1,331 @@
-import cv2
-import numpy as np
-import threading
-import time
-import os
-from queue import Queue, Empty
-import insightface
-from database_manager import DatabaseManager
-
-class FaceRecognizer:
-    def __init__(self, model_path, json_database_path, results_queue, config_manager=None):
-        self.json_database_path = json_database_path
-        self.db_manager = DatabaseManager(json_database_path)
-        self.results_queue = results_queue
-        self.running = False
-        self.config_manager = config_manager
-        
-        # Load configuration values
-        if config_manager:
-            self.similarity_threshold = config_manager.get('face_recognition.similarity_threshold', 0.40)
-        else:
-            self.similarity_threshold = 0.40
-        
-        # Initialize InsightFace
-        try:
-            self.app = insightface.app.FaceAnalysis()
-            self.app.prepare(ctx_id=0, det_size=(320, 320))
-        except Exception as e:
-            raise
-        
-    def recognize_faces(self, face_queue):
-        """Main face recognition loop (silent mode)"""
-        self.running = True
-        
-        while self.running:
-            try:
-                face_data = face_queue.get(timeout=1)
-                self.process_face(face_data)
-            except Empty:
-                continue
-            except:
-                continue
-    
-    def process_face(self, face_data):
-        """Process a single face for recognition (silent)"""
-        try:
-            face_img = face_data['image']
-            face_id = face_data['face_id']
-            bbox = face_data['bbox']
-            timestamp = face_data['timestamp']
-            
-            # Convert BGR to RGB
-            face_rgb = cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB)
-            
-            # Get face embedding
-            faces = self.app.get(face_rgb)
-            
-            if len(faces) > 0:
-                face = faces[0]
-                embedding = face.embedding
-                
-                # Search for similar face in JSON database
-                similar_person = self.db_manager.find_similar_face(embedding, threshold=self.similarity_threshold)
-                
-                if similar_person:
-                    person_id, person_name, similarity = similar_person
-                    confidence_percent = similarity * 100
-                    
-                    # Send result back to detection thread
-                    result = {
-                        'face_id': face_id,
-                        'person_name': person_name,
-                        'confidence': confidence_percent,
-                        'timestamp': time.time(),
-                        'bbox': bbox
-                    }
-                    self.results_queue.put(result)
-                else:
-                    # Send unknown result
-                    result = {
-                        'face_id': face_id,
-                        'person_name': 'UNKNOWN',
-                        'confidence': 0.0,
-                        'timestamp': time.time(),
-                        'bbox': bbox
-                    }
-                    self.results_queue.put(result)
-                    
-                    # Handle unknown person
-                    self.handle_unknown_person(face_img, face_id)
-                        
-            else:
-                # Send no face result
-                result = {
-                    'face_id': face_id,
-                    'person_name': 'NO_FACE',
-                    'confidence': 0.0,
-                    'timestamp': time.time(),
-                    'bbox': bbox
-                }
-                self.results_queue.put(result)
-                    
-        except:
-            pass
-    
-    def handle_unknown_person(self, face_img, face_id):
-        """Handle unknown person detection (silent)"""
-        unknown_folder = "unknown_faces"
-        os.makedirs(unknown_folder, exist_ok=True)
-        
-        timestamp = int(time.time())
-        filename = f"unknown_{face_id}_{timestamp}.jpg"
-        filepath = os.path.join(unknown_folder, filename)
-        cv2.imwrite(filepath, face_img)
-        
-        # Cleanup old unknown faces to keep only 10 images
-        self.cleanup_unknown_folder(unknown_folder)
-    
-    def cleanup_unknown_folder(self, unknown_folder):
-        """Keep only 10 most recent unknown face images"""
-        try:
-            files_in_folder = [f for f in os.listdir(unknown_folder) if f.endswith('.jpg')]
-            
-            if len(files_in_folder) <= 10:
-                return
-            
-            # Get files with creation time
-            files_with_time = []
-            for filename in files_in_folder:
-                filepath = os.path.join(unknown_folder, filename)
-                try:
-                    file_time = os.path.getctime(filepath)
-                    files_with_time.append((filename, filepath, file_time))
-                except:
-                    continue
-            
-            # Sort by creation time (oldest first)
-            files_with_time.sort(key=lambda x: x[2])
-            
-            # Delete oldest files to keep only 10
-            files_to_delete = files_with_time[:-10]
-            
-            for filename, filepath, file_time in files_to_delete:
-                try:
-                    os.remove(filepath)
-                except:
-                    pass
-                    
-        except:
-            pass
-    
-    def stop(self):
-        """Stop face recognition"""
-        self.running = False
-    
-    def reload_config(self):
-        """Reload configuration from config file"""
-        if self.config_manager:
-            try:
-                self.config_manager.reload_config()
-                self.similarity_threshold = self.config_manager.get('face_recognition.similarity_threshold', 0.40)
-                print("🔄 Face recognition configuration reloaded successfully!")
-                return True
-            except Exception as e:
-                print(f"❌ Error reloading face recognition configuration: {e}")
-                return False
+import cv2
+import numpy as np
+import threading
+import time
+import os
+from queue import Queue, Empty
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import zipfile
+import insightface
+from insightface.utils import face_align
+import onnxruntime
+from database_manager import DatabaseManager
+
+@dataclass(slots=True)
+class RecogResult:
+    """Recognition outcome for one detected face, sent back to the detector"""
+    face_id: str
+    person_name: str
+    confidence: float
+    timestamp: float
+    bbox: tuple
+
+class FaceRecognizer:
+    # Unknown face images kept on disk
+    MAX_UNKNOWN_FACES = 10
+    # JPEG quality for unknown face images; lower encodes faster
+    UNKNOWN_JPEG_QUALITY = 80
+    # Reuse a match for a face at (nearly) the same spot for this many seconds
+    RESULT_CACHE_TTL = 0.5
+    RESULT_CACHE_SIZE = 256
+    RESULT_CACHE_GRID = 32  # pixels; bbox corners are snapped to this grid for the key
+    # Minimum seconds between printed recognition errors
+    ERROR_REPORT_INTERVAL = 5.0
+    # Unmatched faces are re-checked on the padded 224 crop before being called UNKNOWN
+    VERIFY_DET_SIZE = (224, 224)
+    VERIFY_DET_THRESHOLD = 0.5
+    
+    def __init__(self, model_path, json_database_path, results_queue, config_manager=None):
+        self.json_database_path = json_database_path
+        precision = config_manager.get('face_recognition.embedding_precision', 'float32') if config_manager else 'float32'
+        self.db_manager = DatabaseManager(json_database_path, precision)
+        print(f"🧮 Similarity backend: {self.db_manager.backend}")
+        self.results_queue = results_queue
+        self.running = False
+        self.config_manager = config_manager
+        
+        # Load configuration values
+        if config_manager:
+            self.similarity_threshold = config_manager.get('face_recognition.similarity_threshold', 0.40)
+            self.batch_size = max(1, int(config_manager.get('face_recognition.batch_size', 8)))
+            self.batch_wait = config_manager.get('face_recognition.batch_wait_ms', 5) / 1000.0
+        else:
+            self.similarity_threshold = 0.40
+            self.batch_size = 8
+            self.batch_wait = 0.005
+        
+        # Initialize the InsightFace recognition (ArcFace) model; faces are already
+        # localized by the YOLO detector, so the pack's detector only verifies misses
+        rec_model_name = config_manager.get('face_recognition.recognition_model', 'w600k_r50.onnx') if config_manager else 'w600k_r50.onnx'
+        det_model_name = config_manager.get('face_recognition.detection_model', 'det_10g.onnx') if config_manager else 'det_10g.onnx'
+        # Prefer CUDA; only request providers this onnxruntime build actually has
+        available = onnxruntime.get_available_providers()
+        providers = [p for p in ('CUDAExecutionProvider', 'CPUExecutionProvider') if p in available]
+        self.rec_model = insightface.model_zoo.get_model(self.resolve_recognition_model(model_path, rec_model_name),
+                                                         providers=providers)
+        if self.rec_model is None:
+            raise RuntimeError(f"Could not load InsightFace recognition model: {rec_model_name}")
+        self.rec_model.prepare(ctx_id=0)
+        print(f"🧠 Recognition model running on: {self.rec_model.session.get_providers()[0]}")
+        
+        self.det_model = insightface.model_zoo.get_model(self.resolve_recognition_model(model_path, det_model_name),
+                                                         providers=providers)
+        if self.det_model is None:
+            raise RuntimeError(f"Could not load InsightFace detection model: {det_model_name}")
+        self.det_model.prepare(ctx_id=0, input_size=self.VERIFY_DET_SIZE, det_thresh=self.VERIFY_DET_THRESHOLD)
+        
+        # Warm up so the first real face does not pay for session/kernel setup
+        width, height = self.rec_model.input_size
+        self.rec_model.get_feat(np.zeros((height, width, 3), dtype=np.uint8))
+        self.det_model.detect(np.zeros(self.VERIFY_DET_SIZE[::-1] + (3,), dtype=np.uint8), max_num=1)
+        
+        # Newest unknown face files, oldest first; seeded once from disk
+        self.unknown_folder = "unknown_faces"
+        os.makedirs(self.unknown_folder, exist_ok=True)
+        self._unknown_ring = deque(self.scan_unknown_folder(self.unknown_folder), maxlen=self.MAX_UNKNOWN_FACES)
+        # Unknown faces are encoded and written off the recognition thread
+        self._io_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="UnknownFaceWriter")
+        
+        # Recent matches keyed by snapped bbox: face_ids are new on every detection,
+        # so a steadily tracked face is recognized by position instead
+        self._result_cache = {}
+        self._last_error_report = 0.0
+    
+    def resolve_recognition_model(self, model_path, rec_model_name):
+        """Locate the recognition ONNX file inside the InsightFace model pack"""
+        pack_dir = os.path.splitext(model_path)[0] if model_path.endswith('.zip') else model_path
+        
+        # Unpack a local model pack zip on first use
+        if not os.path.isdir(pack_dir) and model_path.endswith('.zip') and os.path.exists(model_path):
+            with zipfile.ZipFile(model_path) as zf:
+                zf.extractall(pack_dir)
+        
+        rec_path = os.path.join(pack_dir, rec_model_name)
+        if os.path.exists(rec_path):
+            return rec_path
+        
+        # Fall back to InsightFace's own model cache (downloads the pack if missing)
+        pack_dir = insightface.utils.ensure_available('models', os.path.basename(pack_dir))
+        return os.path.join(pack_dir, rec_model_name)
+        
+    def recognize_faces(self, face_queue):
+        """Main face recognition loop (silent mode)"""
+        self.running = True
+        # Bound once; the loop body then only does local lookups
+        collect_batch = self.collect_batch
+        process_faces = self.process_faces
+        
+        try:
+            while self.running:
+                try:
+                    process_faces(collect_batch(face_queue))
+                except Empty:
+                    continue
+                except Exception as e:
+                    # Only the loop handles errors, so the per-face code runs without handlers
+                    self.report_error(e)
+        finally:
+            # The loop is the only submitter: once it has exited, finish any
+            # queued unknown face writes and release the writer thread
+            self._io_pool.shutdown(wait=True)
+    
+    def report_error(self, error):
+        """Print a recognition error, at most once per ERROR_REPORT_INTERVAL"""
+        now = time.time()
+        if now - self._last_error_report >= self.ERROR_REPORT_INTERVAL:
+            self._last_error_report = now
+            print(f"❌ Face recognition error: {error!r}")
+    
+    def collect_batch(self, face_queue):
+        """Wait for one face, then gather whatever else arrives within the batch window"""
+        if hasattr(face_queue, 'get_batch'):
+            # FaceRing: images are slot views, valid until the next collect_batch
+            return face_queue.get_batch(self.batch_size, self.batch_wait, timeout=1)
+        
+        batch = [face_queue.get(timeout=1)]
+        deadline = time.monotonic() + self.batch_wait
+        
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(face_queue.get(timeout=remaining) if remaining > 0 else face_queue.get_nowait())
+            except Empty:
+                break
+        
+        return batch
+    
+    def process_face(self, face_data):
+        """Process a single face for recognition (silent)"""
+        self.process_faces([face_data])
+    
+    def process_faces(self, batch):
+        """Embed a batch of faces in one model call and match them together (silent)"""
+        # One clock read per batch, shared by cache checks and result timestamps
+        now = time.time()
+        cache = self._result_cache
+        cache_key = self.cache_key
+        emit_result = self.emit_result
+        pending = []
+        for face_data in batch:
+            hit = cache.get(cache_key(face_data['bbox']))
+            if hit is not None and hit[1] > now:
+                emit_result(face_data, hit[0], now)
+            else:
+                pending.append(face_data)
+        
+        if not pending:
+            return
+        batch = pending
+        
+        # The detector already cut model-sized BGR crops; get_feat swaps channels
+        # while building the blob, so this thread only runs the network
+        embeddings = self.rec_model.get_feat([face_data['aligned'] for face_data in batch])
+        
+        # Score every embedding against the database in one matrix product
+        matches = self.db_manager.find_similar_faces(embeddings, threshold=self.similarity_threshold)
+        
+        # Misses may be YOLO false positives or badly cropped faces: verify them
+        misses = [index for index, similar_person in enumerate(matches) if not similar_person]
+        found = [True] * len(batch)
+        if misses:
+            verified = self.verify_faces([batch[index] for index in misses])
+            for index, similar_person in zip(misses, verified):
+                if similar_person is False:
+                    found[index] = False
+                else:
+                    matches[index] = similar_person
+        
+        if len(cache) + len(batch) > self.RESULT_CACHE_SIZE:
+            self.prune_result_cache(now)
+            cache = self._result_cache
+        expires_at = now + self.RESULT_CACHE_TTL
+        for face_data, similar_person, face_found in zip(batch, matches, found):
+            if not face_found:
+                emit_result(face_data, None, now, face_found=False)
+                continue
+            cache[cache_key(face_data['bbox'])] = (similar_person, expires_at)
+            emit_result(face_data, similar_person, now)
+    
+    def verify_faces(self, batch):
+        """Re-detect unmatched faces on their padded crop, realign and match again.
+        
+        Returns one entry per face: a match, None for a real but unknown face, or
+        False when the InsightFace detector finds no face at all.
+        """
+        results = [False] * len(batch)
+        found = []
+        crops = []
+        for index, face_data in enumerate(batch):
+            _, kpss = self.det_model.detect(face_data['image'], max_num=1)
+            if kpss is not None and len(kpss):
+                found.append(index)
+                crops.append(face_align.norm_crop(face_data['image'], kpss[0], image_size=self.rec_model.input_size[0]))
+        
+        if crops:
+            embeddings = self.rec_model.get_feat(crops)
+            matches = self.db_manager.find_similar_faces(embeddings, threshold=self.similarity_threshold)
+            for index, similar_person in zip(found, matches):
+                results[index] = similar_person
+        return results
+    
+    def cache_key(self, bbox):
+        """Snap a face bbox to the cache grid"""
+        grid = self.RESULT_CACHE_GRID
+        x1, y1, x2, y2 = bbox
+        return (x1 // grid, y1 // grid, x2 // grid, y2 // grid)
+    
+    def prune_result_cache(self, now):
+        """Drop expired cached matches; start over if it is still full of live ones"""
+        self._result_cache = {key: hit for key, hit in self._result_cache.items() if hit[1] > now}
+        if len(self._result_cache) >= self.RESULT_CACHE_SIZE:
+            self._result_cache.clear()
+    
+    def emit_result(self, face_data, similar_person, now=None, face_found=True):
+        """Publish the recognition result for one face"""
+        if now is None:
+            now = time.time()
+        face_id = face_data['face_id']
+        
+        if not face_found:
+            person_name, confidence_percent = 'NO_FACE', 0.0
+        elif similar_person:
+            person_id, person_name, similarity = similar_person
+            confidence_percent = similarity * 100
+        else:
+            person_name, confidence_percent = 'UNKNOWN', 0.0
+        
+        # Send result back to detection thread
+        self.results_queue.put(RecogResult(face_id, person_name, confidence_percent, now, face_data['bbox']))
+        
+        if face_found and not similar_person:
+            self.handle_unknown_person(face_data['image'], face_id, now)
+    
+    def handle_unknown_person(self, face_img, face_id, now=None):
+        """Handle unknown person detection"""
+        timestamp = int(now if now is not None else time.time())
+        filename = f"unknown_{face_id}_{timestamp}.jpg"
+        filepath = os.path.join(self.unknown_folder, filename)
+        
+        # Keep only the newest images: the ring evicts the oldest on append
+        evicted = self._unknown_ring[0] if len(self._unknown_ring) == self._unknown_ring.maxlen else None
+        self._unknown_ring.append(filepath)
+        
+        # face_img is a view into the shared face ring, so the writer gets its own copy
+        self._io_pool.submit(self.write_unknown_face, filepath, face_img.copy(), evicted)
+    
+    def write_unknown_face(self, filepath, face_img, evicted=None):
+        """Encode and write one unknown face, then drop the evicted file (silent)"""
+        try:
+            cv2.imwrite(filepath, face_img, [cv2.IMWRITE_JPEG_QUALITY, self.UNKNOWN_JPEG_QUALITY])
+        except cv2.error as e:
+            self.report_error(e)
+        
+        if evicted is not None:
+            try:
+                os.remove(evicted)
+            except OSError:
+                pass  # Already removed by the detector's folder cleanup
+    
+    def scan_unknown_folder(self, unknown_folder):
+        """Prune the unknown folder to the newest images and return them, oldest first (silent)"""
+        files_with_time = []
+        try:
+            with os.scandir(unknown_folder) as it:
+                for entry in it:
+                    if entry.name.endswith('.jpg'):
+                        try:
+                            files_with_time.append((entry.stat().st_ctime, entry.path))
+                        except OSError:
+                            continue
+        except OSError:
+            return []
+        
+        files_with_time.sort()
+        excess = max(0, len(files_with_time) - self.MAX_UNKNOWN_FACES)
+        for _, filepath in files_with_time[:excess]:
+            try:
+                os.remove(filepath)
+            except OSError:
+                pass
+        return [filepath for _, filepath in files_with_time[excess:]]
+    
+    def stop(self):
+        """Stop face recognition"""
+        self.running = False
+    
+    def reload_config(self):
+        """Reload configuration from config file"""
+        if self.config_manager:
+            try:
+                self.config_manager.reload_config()
+                self.similarity_threshold = self.config_manager.get('face_recognition.similarity_threshold', 0.40)
+                self.batch_size = max(1, int(self.config_manager.get('face_recognition.batch_size', 8)))
+                self.batch_wait = self.config_manager.get('face_recognition.batch_wait_ms', 5) / 1000.0
+                print("🔄 Face recognition configuration reloaded successfully!")
+                return True
+            except Exception as e:
+                print(f"❌ Error reloading face recognition configuration: {e}")
+                return False
         return False
\ No newline at end of file
@@ -0,0 +1,88 @@
+import threading
+import time
+import numpy as np
+from queue import Empty, Full
+
+
+class FaceRing:
+    """Single-producer single-consumer ring of preallocated face crop slots.
+
+    The detector thread is the only writer of ``_head`` and the recognizer thread
+    the only writer of ``_tail``/``_released``, so no lock guards the indices;
+    an Event only wakes the consumer when the ring runs dry.
+    """
+
+    def __init__(self, capacity, slot_shapes):
+        self.capacity = capacity
+        # One preallocated uint8 array per image field, e.g. {'image': (224, 224, 3)}
+        self._slots = {field: np.empty((capacity,) + tuple(shape), dtype=np.uint8)
+                       for field, shape in slot_shapes.items()}
+        self._meta = [None] * capacity
+        self._head = 0      # next slot the producer writes
+        self._tail = 0      # next slot the consumer reads
+        self._released = 0  # slots before this index may be overwritten
+        self._ready = threading.Event()
+
+    def put(self, face_data):
+        """Copy the face images into the next free slot and publish it; raises Full"""
+        head = self._head
+        if head - self._released >= self.capacity:
+            raise Full
+
+        slot = head % self.capacity
+        for field, slots in self._slots.items():
+            np.copyto(slots[slot], face_data[field])
+            face_data[field] = slots[slot]
+        self._meta[slot] = face_data
+
+        # Publish only after the slot is fully written
+        self._head = head + 1
+        self._ready.set()
+
+    put_nowait = put
+
+    def get_batch(self, max_items, wait, timeout=1.0):
+        """Block for one face, then take up to max_items arriving within wait seconds.
+
+        Images in the returned dicts are views into the ring; they stay valid until
+        the next get_batch call, which hands their slots back to the producer.
+        """
+        self._released = self._tail
+
+        if not self.wait_ready(timeout):
+            raise Empty
+
+        batch = []
+        deadline = time.monotonic() + wait
+        while len(batch) < max_items:
+            if self._head == self._tail:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.wait_ready(remaining):
+                    break
+
+            slot = self._tail % self.capacity
+            batch.append(self._meta[slot])
+            self._meta[slot] = None
+            self._tail += 1
+
+        return batch
+
+    def wait_ready(self, timeout):
+        """Wait until the producer has published past the consumer's tail"""
+        if self._head != self._tail:
+            return True
+        # Clear then re-check so a put landing in between is not missed
+        self._ready.clear()
+        if self._head != self._tail:
+            return True
+        return self._ready.wait(timeout) and self._head != self._tail
+
+    def full(self):
+        """Producer-side check: True while put would raise Full"""
+        return self._head - self._released >= self.capacity
+
+    def qsize(self):
+        return self._head - self._tail
+
+    def empty(self):
+        return self._head == self._tail
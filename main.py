@@ -1,104 +1,149 @@
-import threading
-import time
-import os
-from face_detection import FaceDetector
-from face_recognition import FaceRecognizer
-from config_manager import ConfigManager
-
-def main():
-    try:
-        # Load configuration
-        config = ConfigManager("config.yaml")
-        
-        # Get configuration values
-        face_detection_config = config.get_face_detection_config()
-        face_recognition_config = config.get_face_recognition_config()
-        
-        YOLO_MODEL_PATH = face_detection_config.get('model_path', 'yolov11m-face.pt')
-        SAVE_FOLDER = face_detection_config.get('save_folder', 'Face_imagers')
-        INSIGHTFACE_MODEL_PATH = face_recognition_config.get('insightface_model_path', 'insightface_models/models/buffalo_l.zip')
-        JSON_DATABASE_PATH = face_recognition_config.get('json_database_path', 'face_embeddings.json')
-        
-        print("🚀 Starting Face Recognition System...")
-        print(f"📁 Configuration loaded from: config.yaml")
-        
-        if not os.path.exists(JSON_DATABASE_PATH):
-            print(f"❌ JSON database not found: {JSON_DATABASE_PATH}")
-            return
-        
-    except Exception as e:
-        print(f"❌ Error loading configuration: {e}")
-        return
-    
-    try:
-        # Initialize components with configuration
-        face_detector = FaceDetector(YOLO_MODEL_PATH, SAVE_FOLDER, config)
-        
-        # Get queues
-        face_queue = face_detector.get_face_queue()
-        results_queue = face_detector.get_recognition_results_queue()
-        
-        # Initialize face recognizer with configuration
-        face_recognizer = FaceRecognizer(INSIGHTFACE_MODEL_PATH, JSON_DATABASE_PATH, results_queue, config)
-        
-        # Create threads
-        detection_thread = threading.Thread(target=face_detector.detect_faces, name="FaceDetectionThread")
-        recognition_thread = threading.Thread(target=face_recognizer.recognize_faces, args=(face_queue,), name="FaceRecognitionThread")
-        
-        # Start threads
-        detection_thread.start()
-        recognition_thread.start()
-        
-        # Configuration monitoring
-        config_file_path = "config.yaml"
-        config_last_modified = os.path.getmtime(config_file_path) if os.path.exists(config_file_path) else 0
-        
-        def monitor_config_changes():
-            """Monitor config file for changes and reload if needed"""
-            nonlocal config_last_modified
-            while detection_thread.is_alive() and recognition_thread.is_alive():
-                try:
-                    if os.path.exists(config_file_path):
-                        current_modified = os.path.getmtime(config_file_path)
-                        if current_modified > config_last_modified:
-                            print("📝 Config file changed, reloading...")
-                            if face_detector.reload_config():
-                                face_recognizer.reload_config()
-                            config_last_modified = current_modified
-                    time.sleep(2)  # Check every 2 seconds
-                except Exception as e:
-                    print(f"❌ Error monitoring config: {e}")
-                    time.sleep(5)
-        
-        # Start config monitoring thread
-        config_monitor_thread = threading.Thread(target=monitor_config_changes, name="ConfigMonitorThread", daemon=True)
-        config_monitor_thread.start()
-        
-        print("✅ System running - Press 'q' in video window to quit")
-        print("📝 Configuration will be reloaded automatically when config.yaml is modified")
-        
-        # Keep main thread alive
-        while detection_thread.is_alive() and recognition_thread.is_alive():
-            time.sleep(1)
-            
-    except KeyboardInterrupt:
-        print("\n🛑 Shutting down...")
-    except Exception as e:
-        print(f"❌ Error: {e}")
-    finally:
-        # Stop components
-        if 'face_detector' in locals():
-            face_detector.stop()
-        if 'face_recognizer' in locals():
-            face_recognizer.stop()
-        
-        # Wait for threads to finish
-        if 'detection_thread' in locals() and detection_thread.is_alive():
-            detection_thread.join(timeout=5)
-        if 'recognition_thread' in locals() and recognition_thread.is_alive():
-            recognition_thread.join(timeout=5)
-        
-        print("✅ System shutdown complete.")
-
-if __name__ == "__main__":
+import asyncio
+import threading
+import os
+from face_detection import FaceDetector
+from face_recognition import FaceRecognizer
+from config_manager import ConfigManager
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+class ConfigFileHandler(FileSystemEventHandler):
+    """Forward filesystem events that touch the config file to a callback"""
+    
+    def __init__(self, config_file_path, on_change):
+        self.config_file_path = os.path.abspath(config_file_path)
+        self.on_change = on_change
+    
+    def on_any_event(self, event):
+        # Editors often save by writing a temp file and renaming it over the original
+        paths = (event.src_path, getattr(event, 'dest_path', ''))
+        if any(path and os.path.abspath(path) == self.config_file_path for path in paths):
+            self.on_change()
+
+def main():
+    try:
+        # Load configuration
+        config = ConfigManager("config.yaml")
+        
+        # Get configuration values
+        face_detection_config = config.get_face_detection_config()
+        face_recognition_config = config.get_face_recognition_config()
+        
+        YOLO_MODEL_PATH = face_detection_config.get('model_path', 'yolov11m-face.pt')
+        SAVE_FOLDER = face_detection_config.get('save_folder', 'Face_imagers')
+        INSIGHTFACE_MODEL_PATH = face_recognition_config.get('insightface_model_path', 'insightface_models/models/buffalo_l.zip')
+        JSON_DATABASE_PATH = face_recognition_config.get('json_database_path', 'face_embeddings.json')
+        
+        print("🚀 Starting Face Recognition System...")
+        print(f"📁 Configuration loaded from: config.yaml")
+        
+        if not os.path.exists(JSON_DATABASE_PATH):
+            print(f"❌ JSON database not found: {JSON_DATABASE_PATH}")
+            return
+        
+    except Exception as e:
+        print(f"❌ Error loading configuration: {e}")
+        return
+    
+    try:
+        # Initialize components with configuration
+        face_detector = FaceDetector(YOLO_MODEL_PATH, SAVE_FOLDER, config)
+        
+        # Get queues
+        face_queue = face_detector.get_face_queue()
+        results_queue = face_detector.get_recognition_results_queue()
+        
+        # Initialize face recognizer with configuration
+        face_recognizer = FaceRecognizer(INSIGHTFACE_MODEL_PATH, JSON_DATABASE_PATH, results_queue, config)
+        
+        # Create threads
+        detection_thread = threading.Thread(target=face_detector.detect_faces, name="FaceDetectionThread")
+        recognition_thread = threading.Thread(target=face_recognizer.recognize_faces, args=(face_queue,), name="FaceRecognitionThread")
+        
+        # Start threads
+        detection_thread.start()
+        recognition_thread.start()
+        
+        # Configuration monitoring
+        config_file_path = "config.yaml"
+        config_last_modified = os.path.getmtime(config_file_path) if os.path.exists(config_file_path) else 0
+        
+        def reload_if_changed():
+            """Reload config if the file is newer than the last applied version"""
+            nonlocal config_last_modified
+            # One save can raise several events; the mtime check applies it once
+            if os.path.exists(config_file_path):
+                current_modified = os.path.getmtime(config_file_path)
+                if current_modified > config_last_modified:
+                    print("📝 Config file changed, reloading...")
+                    if face_detector.reload_config():
+                        face_recognizer.reload_config()
+                    config_last_modified = current_modified
+        
+        async def supervise():
+            """Watch thread liveness and config changes from one event loop"""
+            loop = asyncio.get_running_loop()
+            config_changed = asyncio.Event()
+            observer = None
+            
+            if Observer is not None:
+                # inotify / FSEvents / ReadDirectoryChangesW: no work until the file
+                # changes; the observer thread only wakes the loop
+                observer = Observer()
+                observer.daemon = True
+                observer.schedule(ConfigFileHandler(config_file_path, lambda: loop.call_soon_threadsafe(config_changed.set)),
+                                  os.path.dirname(os.path.abspath(config_file_path)), recursive=False)
+                observer.start()
+            
+            ticks = 0
+            try:
+                while detection_thread.is_alive() and recognition_thread.is_alive():
+                    try:
+                        await asyncio.wait_for(config_changed.wait(), timeout=1.0)
+                    except asyncio.TimeoutError:
+                        ticks += 1
+                        # Without watchdog, poll the mtime every 2 seconds
+                        if observer is not None or ticks % 2:
+                            continue
+                    config_changed.clear()
+                    
+                    try:
+                        reload_if_changed()
+                    except Exception as e:
+                        print(f"❌ Error monitoring config: {e}")
+            finally:
+                if observer is not None:
+                    observer.stop()
+        
+        print("✅ System running - Press 'q' in video window to quit")
+        print("📝 Configuration will be reloaded automatically when config.yaml is modified")
+        
+        # Main thread runs the supervision loop until either worker exits
+        asyncio.run(supervise())
+            
+    except KeyboardInterrupt:
+        print("\n🛑 Shutting down...")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+    finally:
+        # Stop components
+        if 'face_detector' in locals():
+            face_detector.stop()
+        if 'face_recognizer' in locals():
+            face_recognizer.stop()
+        
+        # Wait for threads to finish
+        if 'detection_thread' in locals() and detection_thread.is_alive():
+            detection_thread.join(timeout=5)
+        if 'recognition_thread' in locals() and recognition_thread.is_alive():
+            recognition_thread.join(timeout=5)
+        
+        print("✅ System shutdown complete.")
+
+if __name__ == "__main__":
     main()
\ No newline at end of file